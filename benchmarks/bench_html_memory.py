@@ -0,0 +1,68 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+HTML表格流式读取的内存基准测试
+生成不同行数的合成 .xls（HTML）文件，分别在子进程中用 iter_html_table_rows 读取全部行，
+比较内存峰值：分段解析时峰值只与段大小有关，不应随文件大小增长。
+内存峰值的增长超过 --max-growth 时以状态码 1 退出，可用于发现内存回退。
+
+用法: python benchmarks/bench_html_memory.py [--rows 10000,80000] [--max-growth 50]
+"""
+
+import argparse
+import os
+import subprocess
+import sys
+import tempfile
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO_ROOT = os.path.normpath(os.path.join(BENCH_DIR, '..'))
+
+# 在子进程中读取全部行并输出 行数、耗时和内存峰值，使每次测量的内存峰值互不影响
+READER = """
+import sys, time
+sys.path.insert(0, {repo!r})
+from cli_excel_processor import iter_html_table_rows, _peak_rss_bytes
+started = time.perf_counter()
+rows = sum(1 for _ in iter_html_table_rows({path!r}))
+print(rows, time.perf_counter() - started, _peak_rss_bytes() or 0)
+"""
+
+
+def measure(path):
+    """返回 (行数, 耗时秒, 内存峰值字节)"""
+    output = subprocess.run([sys.executable, '-c', READER.format(repo=REPO_ROOT, path=path)],
+                            check=True, capture_output=True, text=True).stdout.split()
+    return int(output[0]), float(output[1]), int(output[2])
+
+
+def main():
+    parser = argparse.ArgumentParser(description='HTML表格流式读取的内存基准测试')
+    parser.add_argument('--rows', default='10000,80000', help='合成文件的行数，逗号分隔 (默认: 10000,80000)')
+    parser.add_argument('--max-growth', type=float, default=50,
+                        help='最大文件与最小文件的内存峰值之差的上限(MB) (默认: 50)')
+    args = parser.parse_args()
+
+    sys.path.insert(0, BENCH_DIR)
+    from synthetic_export import generate_export
+
+    peaks = []
+    with tempfile.TemporaryDirectory() as temp_dir:
+        for rows in sorted(int(value) for value in args.rows.split(',')):
+            path = generate_export(os.path.join(temp_dir, f"synth_{rows}.xls"), rows, images=0)
+            size = os.path.getsize(path)
+            read_rows, seconds, peak = measure(path)
+            os.remove(path)
+            peaks.append(peak)
+            print(f"{rows:>8} 行 | 文件 {size / 1024 / 1024:7.1f} MB | 读取 {read_rows} 行 "
+                  f"{seconds:6.2f} 秒 | 内存峰值 {peak / 1024 / 1024:6.0f} MB")
+
+    growth = (max(peaks) - min(peaks)) / 1024 / 1024
+    print(f"内存峰值增长: {growth:.0f} MB (上限 {args.max_growth:.0f} MB)")
+    if growth > args.max_growth:
+        print("❌ 内存峰值随文件大小增长")
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,84 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+图片URL索引基准测试
+对比旧实现（两次 iterrows：收集去重URL、记录每个URL所在的行）与
+build_image_url_index 的 factorize 实现
+
+用法: python benchmarks/bench_image_url_index.py [--rows 500000] [--unique 20000]
+"""
+
+import argparse
+import contextlib
+import io
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from cli_excel_processor import build_image_url_index  # noqa: E402
+
+
+def legacy_index(result_df, image_column):
+    """旧版 export_columns 中的两次逐行遍历"""
+    image_urls = []
+    seen = set()
+    for _, row in result_df.iterrows():
+        url = row[image_column]
+        if pd.notna(url) and str(url).strip():
+            url_str = str(url)
+            if url_str in seen:
+                continue
+            seen.add(url_str)
+            image_urls.append(url_str)
+
+    rows_by_url = {}
+    for row_idx, (_, row) in enumerate(result_df.iterrows(), 2):
+        image_url = str(row[image_column]) if pd.notna(row[image_column]) else ""
+        rows_by_url.setdefault(image_url, []).append(row_idx)
+    return image_urls, rows_by_url
+
+
+def make_frame(rows, unique, seed=0):
+    """生成带图片列的测试数据：URL集中在少数CDN上，约10%为空"""
+    rng = np.random.default_rng(seed)
+    pool = np.array([f"https://cdn{i % 4}.example.com/p/{i:08x}.jpg" for i in range(unique)], dtype=object)
+    urls = pool[rng.integers(0, unique, size=rows)]
+    urls[rng.random(rows) < 0.1] = None
+    return pd.DataFrame({
+        '商品图片': urls,
+        '编号': np.arange(1, rows + 1),
+        '商品标题': ['测试商品'] * rows,
+    })
+
+
+def main():
+    parser = argparse.ArgumentParser(description='图片URL索引基准测试')
+    parser.add_argument('--rows', type=int, default=500000, help='测试行数 (默认: 500000)')
+    parser.add_argument('--unique', type=int, default=20000, help='不同URL的数量 (默认: 20000)')
+    args = parser.parse_args()
+
+    df = make_frame(args.rows, args.unique)
+
+    start = time.perf_counter()
+    legacy_urls, _ = legacy_index(df, '商品图片')
+    legacy_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        new_urls, _, _ = build_image_url_index(df['商品图片'])
+    new_time = time.perf_counter() - start
+
+    assert legacy_urls == new_urls, "两种实现得到的URL列表不一致"
+    print(f"行数: {args.rows}，不同URL: {len(new_urls)}")
+    print(f"旧实现 (iterrows x2): {legacy_time:.2f} 秒")
+    print(f"新实现 (factorize):   {new_time:.3f} 秒")
+    print(f"加速比: {legacy_time / new_time:.0f}x")
+
+
+if __name__ == '__main__':
+    main()
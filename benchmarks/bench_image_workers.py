@@ -0,0 +1,82 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+图片解码缩放的多进程扩展性基准测试
+生成一批大尺寸JPEG/PNG图片，分别用不同的进程数生成缩略图，输出吞吐量和加速比
+
+用法: python benchmarks/bench_image_workers.py [--images 200] [--workers 1,2,4,8]
+"""
+
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+from PIL import Image
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from cli_excel_processor import _prepare_excel_image, create_image_executor  # noqa: E402
+
+
+def make_images(directory, count, size=(1600, 1200)):
+    """生成测试图片：大部分为JPEG，每5张中有1张带透明通道的PNG"""
+    paths = []
+    for i in range(count):
+        color = (i * 37 % 256, i * 91 % 256, i * 53 % 256)
+        if i % 5 == 4:
+            img = Image.new('RGBA', size, color + (160,))
+            path = os.path.join(directory, f"{i}.png")
+            img.save(path)
+        else:
+            img = Image.linear_gradient('L').resize(size).convert('RGB')
+            img.paste(Image.new('RGB', (size[0] // 2, size[1] // 2), color))
+            path = os.path.join(directory, f"{i}.jpg")
+            img.save(path, quality=90)
+        paths.append(path)
+    return paths
+
+
+def run(paths, workers):
+    """用指定的进程数处理所有图片，返回耗时（秒）"""
+    executor = create_image_executor(workers)
+    try:
+        # 预热：启动子进程不计入耗时
+        list(executor.map(_prepare_excel_image, paths[:workers]))
+        start = time.perf_counter()
+        results = list(executor.map(_prepare_excel_image, paths))
+        elapsed = time.perf_counter() - start
+    finally:
+        executor.shutdown(wait=True)
+    assert all(results), "存在处理失败的图片"
+    return elapsed
+
+
+def main():
+    cpu_count = os.cpu_count() or 1
+    default_workers = sorted({1, 2, 4, 8, 16, 32, cpu_count} & set(range(1, cpu_count + 1)))
+
+    parser = argparse.ArgumentParser(description='图片解码缩放的多进程扩展性基准测试')
+    parser.add_argument('--images', type=int, default=200, help='测试图片数量 (默认: 200)')
+    parser.add_argument('--workers', default=','.join(map(str, default_workers)),
+                        help='逗号分隔的进程数列表 (默认: 不超过CPU核心数的 1,2,4,8,...)')
+    args = parser.parse_args()
+
+    directory = tempfile.mkdtemp(prefix='bench_images_')
+    try:
+        paths = make_images(directory, args.images)
+        print(f"图片数量: {args.images}，CPU核心数: {cpu_count}")
+        print(f"{'进程数':>6} {'耗时(秒)':>10} {'图片/秒':>10} {'加速比':>8}")
+        baseline = None
+        for workers in [int(w) for w in args.workers.split(',')]:
+            elapsed = run(paths, workers)
+            baseline = baseline or elapsed
+            print(f"{workers:>6} {elapsed:>10.2f} {args.images / elapsed:>10.1f} {baseline / elapsed:>8.2f}")
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,64 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+启动时间基准测试
+分别以子进程运行 --help、--list-columns 和一次导出，统计每个场景的墙钟时间（取中位数）。
+指定 --baseline 时同时测量另一个版本的脚本（例如 git show <旧提交>:cli_excel_processor.py 导出的文件）并对比。
+
+用法: python benchmarks/bench_startup.py [--input 82.xls] [--repeat 5] [--baseline old_cli.py]
+"""
+
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+REPO_ROOT = os.path.normpath(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+SCRIPT = os.path.join(REPO_ROOT, 'cli_excel_processor.py')
+
+
+def scenarios(input_file, output_file):
+    """测试场景：(名称, 命令行参数)"""
+    return [
+        ('--help', ['--help']),
+        ('--list-columns', ['-i', input_file, '--list-columns']),
+        ('导出 (-c 1-5)', ['-i', input_file, '-o', output_file, '-c', '1-5']),
+    ]
+
+
+def measure(script, args, repeat):
+    """运行 repeat 次，返回墙钟时间的中位数（秒）"""
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        subprocess.run([sys.executable, script] + args, check=True,
+                       stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        timings.append(time.perf_counter() - start)
+    return statistics.median(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='启动时间基准测试')
+    parser.add_argument('--input', default=os.path.join(REPO_ROOT, '82.xls'),
+                        help='测试用的输入文件 (默认: 82.xls)')
+    parser.add_argument('--repeat', type=int, default=5, help='每个场景的运行次数 (默认: 5)')
+    parser.add_argument('--baseline', help='用于对比的另一个版本的脚本路径')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        output_file = os.path.join(temp_dir, 'out.xlsx')
+        print(f"输入文件: {args.input}，每个场景运行 {args.repeat} 次，取中位数")
+        for name, cli_args in scenarios(args.input, output_file):
+            current = measure(SCRIPT, cli_args, args.repeat)
+            line = f"{name:<16} 当前: {current:.3f} 秒"
+            if args.baseline:
+                baseline = measure(args.baseline, cli_args, args.repeat)
+                line += f" | 对比: {baseline:.3f} 秒 | 加速比: {baseline / current:.1f}x"
+            print(line)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,140 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+本地商品图片服务器
+代替电商平台的图片CDN，为合成导出文件（synthetic_export.py）中的商品图片URL提供图片，
+基准测试中的图片下载不依赖外部网络，结果可以重复。
+
+/img/<编号>.jpg 返回按编号确定生成的JPEG图片（首次请求时生成并缓存在内存中），
+其他路径返回 404；--latency 可为每个请求增加固定延迟，模拟真实网络的往返时间。
+
+用法: python benchmarks/image_server.py [--port 8765] [--size 800x800] [--latency 0.02]
+"""
+
+import argparse
+import io
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+_IMAGE_PATH_RE = re.compile(r'^/img/(\d+)\.jpg$')
+
+
+def render_image(index, size=(800, 800), quality=85):
+    """生成第 index 张图片的JPEG内容，相同的编号总是得到相同的图片"""
+    from PIL import Image, ImageDraw
+
+    color = (index * 37 % 256, index * 91 % 256, index * 53 % 256)
+    img = Image.linear_gradient('L').resize(size).convert('RGB')
+    ImageDraw.Draw(img).rectangle((size[0] // 4, size[1] // 4, size[0] * 3 // 4, size[1] * 3 // 4), fill=color)
+    buffer = io.BytesIO()
+    img.save(buffer, format='JPEG', quality=quality)
+    return buffer.getvalue()
+
+
+class ImageServer:
+    """在后台线程中运行的图片服务器，可以作为上下文管理器使用
+
+    port 为0时由系统分配空闲端口，实际地址见 base_url；requests 记录收到的请求数。
+    """
+
+    def __init__(self, host='127.0.0.1', port=0, size=(800, 800), latency=0.0):
+        self.size = size
+        self.latency = latency
+        self.requests = 0
+        self._images = {}
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer((host, port), self._handler_class())
+        self._server.daemon_threads = True
+        self._thread = None
+
+    @property
+    def base_url(self):
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def image(self, index):
+        """返回第 index 张图片的内容（缓存在内存中）"""
+        with self._lock:
+            data = self._images.get(index)
+        if data is None:
+            data = render_image(index, self.size)
+            with self._lock:
+                self._images[index] = data
+        return data
+
+    def _handler_class(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def do_GET(self):
+                with server._lock:
+                    server.requests += 1
+                if server.latency:
+                    time.sleep(server.latency)
+                match = _IMAGE_PATH_RE.match(self.path.split('?', 1)[0])
+                if not match:
+                    self.send_response(404)
+                    self.send_header('Content-Length', '0')
+                    self.end_headers()
+                    return
+                data = server.image(int(match.group(1)))
+                self.send_response(200)
+                self.send_header('Content-Type', 'image/jpeg')
+                self.send_header('Content-Length', str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
+
+    def serve_forever(self):
+        """在当前线程中运行，直到按 Ctrl+C"""
+        try:
+            self._server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            self._server.server_close()
+
+    def start(self):
+        """在后台线程中运行"""
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc, tb):
+        self.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='本地商品图片服务器')
+    parser.add_argument('--host', default='127.0.0.1', help='监听地址 (默认: 127.0.0.1)')
+    parser.add_argument('--port', type=int, default=8765, help='监听端口 (默认: 8765)')
+    parser.add_argument('--size', default='800x800', help='图片尺寸，宽x高 (默认: 800x800)')
+    parser.add_argument('--latency', type=float, default=0.0, help='每个请求增加的延迟秒数 (默认: 0)')
+    args = parser.parse_args()
+
+    width, height = (int(value) for value in args.size.lower().split('x'))
+    server = ImageServer(args.host, args.port, size=(width, height), latency=args.latency)
+    print(f"图片服务器已启动: {server.base_url}/img/<编号>.jpg，按 Ctrl+C 退出")
+    server.serve_forever()
+
+
+if __name__ == '__main__':
+    main()
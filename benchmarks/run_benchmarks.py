@@ -0,0 +1,343 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+可重复的性能基准测试套件
+用 synthetic_export.py 生成指定行数的合成 .xls（HTML）/.xlsx 文件，用 image_server.py 在本地提供商品图片，
+分别测量 read_excel_file、get_columns_from_input、export_columns（不含图片 / 含图片）和图片下载器的耗时，
+结果写入JSON文件。指定 --compare 时与之前保存的结果逐项对比，任一项变慢超过 --threshold 时以状态码1退出，
+可以直接用于CI中发现性能回退。
+
+用法: python benchmarks/run_benchmarks.py [--rows 10000,50000] [--formats xls,xlsx] [--images 200]
+                                          [--repeat 3] [--output results.json]
+                                          [--compare baseline.json] [--threshold 0.2]
+"""
+
+import argparse
+import contextlib
+import json
+import os
+import platform
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO_ROOT = os.path.normpath(os.path.join(BENCH_DIR, '..'))
+sys.path.insert(0, REPO_ROOT)
+sys.path.insert(0, BENCH_DIR)
+
+import cli_excel_processor as cli  # noqa: E402
+from image_server import ImageServer  # noqa: E402
+from synthetic_export import generate_export, image_url  # noqa: E402
+
+RESULT_VERSION = 1
+
+# 导出测试使用的列：长数字ID、中文文本和商品图片
+EXPORT_COLUMNS = ['主订单号', '子订单号', '商品ID', '商品标题', '商品规格', '买家地址', '买家付款金额', '商品图片']
+# get_columns_from_input 测试使用的列选择：序号范围与列名混合
+COLUMN_SPEC = '1-10,主订单号,子订单号,商品图片,20-30,买家地址,80-86'
+COLUMN_SPEC_CALLS = 1000
+
+CASES = ('read_excel_file', 'read_excel_file_usecols', 'get_columns_from_input',
+         'export_columns', 'export_columns_fast', 'export_columns_images', 'downloader', 'downloader_cached')
+
+
+@contextlib.contextmanager
+def quiet():
+    """屏蔽被测函数的进度输出，避免终端输出影响计时"""
+    with open(os.devnull, 'w', encoding='utf-8') as devnull, contextlib.redirect_stdout(devnull):
+        yield
+
+
+def measure(run, repeat, warmup=1, setup=None):
+    """运行 warmup 次预热和 repeat 次计时，返回每次的耗时（秒）；setup 的返回值传给 run，不计入耗时"""
+    timings = []
+    for index in range(warmup + repeat):
+        state = setup() if setup else None
+        with quiet():
+            start = time.perf_counter()
+            result = run(state)
+            elapsed = time.perf_counter() - start
+        if result is None or result is False:
+            raise RuntimeError("被测函数返回失败")
+        if index >= warmup:
+            timings.append(elapsed)
+    return timings
+
+
+def summarize(name, timings, fmt=None, rows=None, items=None):
+    """一项测试的结果，键名在不同版本之间保持不变，便于对比"""
+    median = statistics.median(timings)
+    result = {
+        'name': name,
+        'format': fmt,
+        'rows': rows,
+        'runs': timings,
+        'median_seconds': median,
+        'min_seconds': min(timings),
+    }
+    if rows and median:
+        result['rows_per_sec'] = rows / median
+    if items and median:
+        result['items'] = items
+        result['items_per_sec'] = items / median
+    return result
+
+
+def result_key(result):
+    """结果在JSON中的键，例如 read_excel_file[xls,10000]"""
+    params = [str(value) for value in (result['format'], result['rows']) if value is not None]
+    return f"{result['name']}[{','.join(params)}]" if params else result['name']
+
+
+def environment():
+    """运行环境信息，对比不同机器上的结果时参考"""
+    versions = {}
+    for module in ('pandas', 'numpy', 'openpyxl', 'lxml', 'PIL', 'requests'):
+        try:
+            versions[module] = __import__(module).__version__
+        except (ImportError, AttributeError):
+            versions[module] = None
+    try:
+        commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=REPO_ROOT,
+                                capture_output=True, text=True, timeout=10).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        commit = None
+    return {
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count(),
+        'commit': commit,
+        'packages': versions,
+    }
+
+
+def new_downloader(cache_dir, workers):
+    """创建使用指定缓存目录的图片下载器"""
+    return cli.ImageDownloader(cli.ImageCache(cache_dir), max_workers=workers, per_host_limit=workers)
+
+
+def close_downloader(downloader):
+    downloader.close()
+    downloader.cache.close()
+
+
+def bench_file(input_file, fmt, rows, args, work_dir, enabled):
+    """针对一个合成文件的各项测试"""
+    results = []
+    output_file = os.path.join(work_dir, 'out.xlsx')
+
+    if 'read_excel_file' in enabled:
+        timings = measure(lambda _: cli.read_excel_file(input_file), args.repeat, args.warmup)
+        results.append(summarize('read_excel_file', timings, fmt, rows))
+
+    if 'read_excel_file_usecols' in enabled:
+        timings = measure(lambda _: cli.read_excel_file(input_file, usecols=EXPORT_COLUMNS),
+                          args.repeat, args.warmup)
+        results.append(summarize('read_excel_file_usecols', timings, fmt, rows))
+
+    export_cases = [name for name in ('export_columns', 'export_columns_fast', 'export_columns_images')
+                    if name in enabled]
+    if not export_cases:
+        return results
+
+    with quiet():
+        df = cli.read_excel_file(input_file, usecols=EXPORT_COLUMNS)
+    text_columns = [name for name in EXPORT_COLUMNS if name != '商品图片']
+
+    for name, engine in (('export_columns', 'openpyxl'), ('export_columns_fast', 'fast')):
+        if name in enabled:
+            timings = measure(lambda _: cli.export_columns(df, text_columns, output_file, engine=engine),
+                              args.repeat, args.warmup)
+            results.append(summarize(name, timings, fmt, rows))
+
+    if 'export_columns_images' in enabled:
+        # 每次使用新的图片缓存目录，包含下载、转换和插入图片的完整耗时
+        def setup():
+            cache_dir = tempfile.mkdtemp(prefix='cache_', dir=work_dir)
+            return new_downloader(cache_dir, args.download_workers)
+
+        def run(downloader):
+            try:
+                return cli.export_columns(df, EXPORT_COLUMNS, output_file, download_images=True,
+                                          engine=args.engine, image_downloader=downloader,
+                                          image_workers=args.image_workers)
+            finally:
+                close_downloader(downloader)
+
+        timings = measure(run, args.repeat, args.warmup, setup=setup)
+        results.append(summarize('export_columns_images', timings, fmt, rows,
+                                 items=int(df['商品图片'].nunique())))
+    return results
+
+
+def bench_downloader(base_url, args, work_dir, enabled):
+    """图片下载器：无缓存时下载全部图片，以及全部命中缓存时的耗时"""
+    results = []
+    urls = [image_url(base_url, index) for index in range(args.images)]
+
+    if 'downloader' in enabled:
+        def setup():
+            return new_downloader(tempfile.mkdtemp(prefix='cache_', dir=work_dir), args.download_workers)
+
+        def run(downloader):
+            try:
+                return len(downloader.download_all(urls)) == len(urls) or None
+            finally:
+                close_downloader(downloader)
+
+        timings = measure(run, args.repeat, args.warmup, setup=setup)
+        results.append(summarize('downloader', timings, items=len(urls)))
+
+    if 'downloader_cached' in enabled:
+        cache_dir = tempfile.mkdtemp(prefix='cache_', dir=work_dir)
+        downloader = new_downloader(cache_dir, args.download_workers)
+        try:
+            with quiet():
+                downloader.download_all(urls)
+            timings = measure(lambda _: len(downloader.download_all(urls)) == len(urls) or None,
+                              args.repeat, args.warmup)
+        finally:
+            close_downloader(downloader)
+        results.append(summarize('downloader_cached', timings, items=len(urls)))
+    return results
+
+
+def bench_column_selection(input_file, args):
+    """解析列选择，单次调用太快，每次计时连续调用 COLUMN_SPEC_CALLS 次"""
+    with quiet():
+        columns = cli.read_column_names(input_file)
+
+    def run(_):
+        for _ in range(COLUMN_SPEC_CALLS):
+            selected = cli.get_columns_from_input(COLUMN_SPEC, columns)
+        return selected
+
+    timings = measure(run, args.repeat, args.warmup)
+    return summarize('get_columns_from_input', timings, items=COLUMN_SPEC_CALLS)
+
+
+def compare(results, baseline, threshold):
+    """与基准结果逐项对比中位数耗时，打印对比表，返回变慢超过 threshold 的项"""
+    regressions = []
+    print(f"\n与基准对比 (基准提交: {baseline.get('environment', {}).get('commit')}，阈值: {threshold:.0%}):")
+    print("=" * 78)
+    for key, result in results.items():
+        old = baseline.get('results', {}).get(key)
+        if not old:
+            print(f"{key:<44} {result['median_seconds']:>8.3f} 秒   (基准中没有此项)")
+            continue
+        ratio = result['median_seconds'] / old['median_seconds'] if old['median_seconds'] else float('inf')
+        mark = ''
+        if ratio > 1 + threshold:
+            mark = '  ⚠ 变慢'
+            regressions.append(key)
+        elif ratio < 1 - threshold:
+            mark = '  ✓ 变快'
+        print(f"{key:<44} {old['median_seconds']:>8.3f} → {result['median_seconds']:>8.3f} 秒  "
+              f"{ratio:>5.2f}x{mark}")
+    print("=" * 78)
+    return regressions
+
+
+def parse_list(value, cast=str):
+    return [cast(item.strip()) for item in value.split(',') if item.strip()]
+
+
+def main():
+    parser = argparse.ArgumentParser(description='可重复的性能基准测试套件')
+    parser.add_argument('--rows', default='10000', help='合成文件的行数，逗号分隔 (默认: 10000)')
+    parser.add_argument('--formats', default='xls,xlsx', help='合成文件的格式：xls、xlsx，逗号分隔 (默认: xls,xlsx)')
+    parser.add_argument('--images', type=int, default=200, help='不同商品图片的数量 (默认: 200)')
+    parser.add_argument('--image-size', type=int, default=800, help='图片服务器返回的图片边长 (默认: 800)')
+    parser.add_argument('--latency', type=float, default=0.0, help='图片服务器每个请求的延迟秒数 (默认: 0)')
+    parser.add_argument('--repeat', type=int, default=3, help='每项测试的计时次数，取中位数 (默认: 3)')
+    parser.add_argument('--warmup', type=int, default=1, help='每项测试计时前的预热次数 (默认: 1)')
+    parser.add_argument('--cases', help=f"只运行指定的测试，逗号分隔（可选: {', '.join(CASES)}）")
+    parser.add_argument('--engine', default='openpyxl', choices=cli.EXPORT_ENGINES,
+                        help='含图片导出测试使用的引擎 (默认: openpyxl)')
+    parser.add_argument('--download-workers', type=int, default=8, help='下载线程数 (默认: 8)')
+    parser.add_argument('--image-workers', type=int, default=None, help='图片转换进程数 (默认: CPU核心数)')
+    parser.add_argument('--seed', type=int, default=0, help='合成数据的随机种子 (默认: 0)')
+    parser.add_argument('--output', default='benchmark_results.json',
+                        help='结果JSON文件 (默认: benchmark_results.json)')
+    parser.add_argument('--compare', help='与之前保存的结果JSON对比')
+    parser.add_argument('--threshold', type=float, default=0.2,
+                        help='中位数耗时增加超过该比例视为性能回退 (默认: 0.2)')
+    args = parser.parse_args()
+
+    enabled = set(parse_list(args.cases)) if args.cases else set(CASES)
+    unknown = enabled - set(CASES)
+    if unknown:
+        parser.error(f"未知的测试: {', '.join(sorted(unknown))}")
+
+    results = []
+    work_dir = tempfile.mkdtemp(prefix='excel_bench_')
+    try:
+        with ImageServer(size=(args.image_size, args.image_size), latency=args.latency) as server:
+            for rows in parse_list(args.rows, int):
+                for fmt in parse_list(args.formats):
+                    input_file = os.path.join(work_dir, f"synthetic_{rows}.{fmt}")
+                    generate_export(input_file, rows, seed=args.seed, images=args.images,
+                                    image_base=server.base_url)
+                    print(f"测试文件: {os.path.basename(input_file)} "
+                          f"({os.path.getsize(input_file) / 1024 / 1024:.1f} MB)")
+                    results.extend(bench_file(input_file, fmt, rows, args, work_dir, enabled))
+
+            if 'get_columns_from_input' in enabled:
+                results.append(bench_column_selection(input_file, args))
+            results.extend(bench_downloader(server.base_url, args, work_dir, enabled))
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    print("\n基准测试结果 (中位数):")
+    print("=" * 78)
+    for result in results:
+        rate = ''
+        if 'rows_per_sec' in result:
+            rate = f"{result['rows_per_sec']:.0f} 行/秒"
+        elif 'items_per_sec' in result:
+            rate = f"{result['items_per_sec']:.0f} 次/秒"
+        print(f"{result_key(result):<44} {result['median_seconds']:>8.3f} 秒  {rate}")
+    print("=" * 78)
+
+    report = {
+        'version': RESULT_VERSION,
+        'created_at': datetime.now().isoformat(timespec='seconds'),
+        'environment': environment(),
+        'config': {
+            'rows': parse_list(args.rows, int),
+            'formats': parse_list(args.formats),
+            'images': args.images,
+            'image_size': args.image_size,
+            'latency': args.latency,
+            'repeat': args.repeat,
+            'warmup': args.warmup,
+            'engine': args.engine,
+            'download_workers': args.download_workers,
+            'image_workers': args.image_workers,
+            'seed': args.seed,
+        },
+        'results': {result_key(result): result for result in results},
+    }
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    print(f"结果已写入: {args.output}")
+
+    if args.compare:
+        with open(args.compare, 'r', encoding='utf-8') as f:
+            baseline = json.load(f)
+        if baseline.get('config') != report['config']:
+            print("\n注意: 基准结果使用的测试参数与本次不同，对比结果仅供参考")
+        regressions = compare(report['results'], baseline, args.threshold)
+        if regressions:
+            print(f"性能回退: {', '.join(regressions)}")
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
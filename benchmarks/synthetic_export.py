@@ -0,0 +1,152 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+合成订单导出文件生成器
+按与 82.xls / 100.xls 相同的列结构生成任意行数的 HTML 格式 .xls 或真正的 .xlsx 文件：
+长数字订单号/ID、指向本地图片服务器的商品图片URL、中文标题/地址/备注等。
+相同的 --rows、--seed 和 --images 总是生成相同的内容，基准测试结果可以相互比较。
+
+用法: python benchmarks/synthetic_export.py -o synth.xls --rows 100000 [--images 500]
+                                             [--image-base http://127.0.0.1:8765]
+"""
+
+import argparse
+import html
+import os
+import random
+from datetime import datetime, timedelta
+
+# 与平台导出文件相同的表头（包括重复的列名）
+HEADER = [
+    '编号', '平台', '站点', '店铺类型', '托管类型', '店铺类别', '店铺名称', '店铺别名', '店铺ID', '店铺标签',
+    '主订单号', '子订单号', '订单状态', '是否有售后', '采购绑定仓库', '颜色标识', '发货状态', '是否首公里预报',
+    '采购类型', '商品ID', '商品链接', '商品图片', '商品单价', '商品单价（RMB）', '商品数量', '商品标题',
+    '规格编号', '商品规格', '商品货号', '买家付款金额', '买家付款金额（RMB）', '买家付款金额（币）', '订单收入',
+    '买家付款金额（币）', '订单收入', '订单收入（RMB）', '采购价', '采购价（RMB）', '平台结算', '平台结算（RMB）',
+    '最终毛利', '最终毛利（RMB）', '付款账号', '采购账号', '采购状态', '采购时间', '采购订单号', '采购物流公司',
+    '采购物流单号', '采购发货时间', '商户订单号', '平台物流', '平台物流单号', '平台运费', '平台费用',
+    '平台费用（RMB）', '订单发货时间', '订单最晚发货时间', '订单自动取消时间', '本地备注', '商家备注', '买家备注',
+    '买家姓名', '买家地址', '手机号', '平台订单支付时间', '平台订单更新时间', '买家支付方式', '订单创建时间',
+    '订单发货时间', '仓库发货状态', '仓库入库时间', '仓库出库时间', '仓库异常信息', '仓库发货金额', '达人名称',
+    '达人ID', '达人佣金', '佣金率', '商家编码', '取消类型', '取消原因', '取消时间', '邮编', '国家', '仓库备注',
+]
+
+SITES = [('菲律宾', 'PHP', 'ph', 0.1238), ('马来西亚', 'MYR', 'my', 1.53),
+         ('泰国', 'THB', 'th', 0.198), ('越南', 'VND', 'vn', 0.00028)]
+STATUSES = ['准备发货', '待发货', '已发货', '已完成', '已取消']
+PRODUCTS = ['纯棉圆领短袖T恤', '男士休闲运动裤', '女士防晒冰丝袖套', '儿童卡通保温水杯', '家用厨房收纳置物架',
+            '无线蓝牙耳机', '手机支架桌面懒人', '加厚珊瑚绒毛毯', '不锈钢保温饭盒', '车载香薰出风口']
+SPECS = ['颜色:白色;尺码:L', '颜色:黑色;尺码:M', '颜色:灰色;尺码:XL', '规格:500ml', '规格:三件套']
+REMARKS = ['', '', '', '请尽快发货', '买家要求加急，备注礼品包装', '地址偏远，注意物流时效']
+CITIES = ['马尼拉市', '宿务市', '吉隆坡', '槟城', '曼谷', '清迈', '胡志明市', '河内']
+LOGISTICS = ['Pickup: LEX PH, Delivery: LEX PH', 'J&T Express', 'Ninja Van', 'Flash Express']
+
+HTML_HEAD = """<html xmlns:o="urn:schemas-microsoft-com:office:office"
+                xmlns:x="urn:schemas-microsoft-com:office:excel"
+                xmlns="http://www.w3.org/TR/REC-html40">
+                <head><!--[if gte mso 9]><xml><x:ExcelWorkbook><x:ExcelWorksheets><x:ExcelWorksheet>
+                <x:Name>订单列表数据</x:Name>
+                <x:WorksheetOptions><x:DisplayGridlines/></x:WorksheetOptions></x:ExcelWorksheet>
+                </x:ExcelWorksheets></x:ExcelWorkbook></xml><![endif]-->
+                <meta charset="gbk2312">
+                </head><body><table>"""
+
+
+def image_url(image_base, index):
+    """合成数据中第 index 张商品图片的URL（由 image_server.py 提供）"""
+    return f"{image_base.rstrip('/')}/img/{index}.jpg"
+
+
+def generate_rows(rows, seed=0, images=500, image_base='http://127.0.0.1:8765'):
+    """逐行生成合成订单数据，每行是与 HEADER 等长的列表，数值列为 int/float，其余为字符串
+
+    商品图片从 images 张不同的图片中随机选取，重复出现的比例与真实导出文件相近；images 为0时不生成图片URL。
+    """
+    rng = random.Random(seed)
+    start = datetime(2025, 6, 1)
+    for number in range(1, rows + 1):
+        site, currency, region, rate = SITES[rng.randrange(len(SITES))]
+        order_id = str(1007000000000000 + rng.randrange(10 ** 15))
+        product_id = str(rng.randrange(10 ** 9, 10 ** 10))
+        price = round(rng.uniform(20, 2000), 2)
+        quantity = rng.randint(1, 5)
+        amount = round(price * quantity, 2)
+        paid = round(amount * rng.uniform(0.7, 1.0), 2)
+        created = start + timedelta(seconds=rng.randrange(30 * 86400))
+        status = STATUSES[rng.randrange(len(STATUSES))]
+        title = f"{PRODUCTS[rng.randrange(len(PRODUCTS))]} {rng.choice(['新款', '热卖', '包邮', '正品'])}"
+        purchased = status in ('已发货', '已完成')
+        picture = image_url(image_base, rng.randrange(images)) if images else ''
+        yield [
+            number, 'Lazada', site, '本土', '', '', f"shop{region}{rng.randrange(1000):03d}",
+            f"seller{rng.randrange(10000)}@163.com", f"{region.upper()}{rng.randrange(36 ** 8):08X}", '运营组',
+            order_id, order_id + (str(rng.randrange(10)) if rng.random() < 0.2 else ''), status,
+            '无售后', '', '标识九', '', '--', '一件代发' if purchased else '', product_id,
+            f"https://www.lazada.com.{region}/products/i{product_id}.html", picture,
+            price, round(price * rate, 2), quantity, title, str(rng.randrange(10 ** 10, 10 ** 11)),
+            SPECS[rng.randrange(len(SPECS))], f"SKU-{rng.randrange(100000):05d}", paid, round(paid * rate, 2),
+            f"{currency}:{paid:.2f}", f"{currency}:{amount:.2f}", paid, amount,
+            round(amount * rate, 2), 0, 0, '', 0, 0, 0, '', '',
+            '已采购' if purchased else '待采购', created.strftime('%Y-%m-%d %H:%M:%S') if purchased else '',
+            str(rng.randrange(10 ** 18, 10 ** 19)) if purchased else '', '中通快递' if purchased else '',
+            str(rng.randrange(10 ** 13, 10 ** 14)) if purchased else '', '',
+            str(rng.randrange(10 ** 17, 10 ** 18)) if rng.random() < 0.5 else '',
+            LOGISTICS[rng.randrange(len(LOGISTICS))], f"MP{rng.randrange(10 ** 10):010d}",
+            f"￥{rng.uniform(1, 20):.2f}", f"{currency}：", '', '', '', '1970/01/05 08:00:00',
+            '', rng.choice(REMARKS), rng.choice(REMARKS), '***',
+            f"{CITIES[rng.randrange(len(CITIES))]}某某区{rng.randrange(1, 999)}号", f"*********{rng.randrange(10000):04d}",
+            created.strftime('%Y-%m-%d %H:%M:%S'), (created + timedelta(minutes=27)).strftime('%Y-%m-%d %H:%M:%S'),
+            rng.choice(['COD', '在线支付']), created.strftime('%Y-%m-%d %H:%M:%S'),
+            '', '', '', '', '', 0, '', '', '', '', f"a{rng.randrange(100)}-{rng.choice('SML')}",
+            '', '', '', '', site, '',
+        ]
+
+
+def write_html_xls(path, rows):
+    """按平台导出的格式写出 HTML 表格形式的 .xls 文件"""
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write(HTML_HEAD)
+        f.write('<tr>' + ''.join(f"\n            <td>{html.escape(name)}</td>" for name in HEADER) + '\n</tr>\n')
+        for row in rows:
+            f.write('<tr>' + ''.join(f"<td>{html.escape(str(value))}</td>" for value in row) + '</tr>\n')
+        f.write('</table></body></html>\n')
+
+
+def write_xlsx(path, rows):
+    """以只写模式写出真正的 .xlsx 文件，空字符串写为空单元格"""
+    from openpyxl import Workbook
+
+    workbook = Workbook(write_only=True)
+    sheet = workbook.create_sheet('订单列表数据')
+    sheet.append(HEADER)
+    for row in rows:
+        sheet.append([None if value == '' else value for value in row])
+    workbook.save(path)
+
+
+def generate_export(path, rows, seed=0, images=500, image_base='http://127.0.0.1:8765'):
+    """生成合成导出文件，按扩展名选择 .xls（HTML）或 .xlsx 格式，返回文件路径"""
+    data = generate_rows(rows, seed=seed, images=images, image_base=image_base)
+    if path.lower().endswith('.xlsx'):
+        write_xlsx(path, data)
+    else:
+        write_html_xls(path, data)
+    return path
+
+
+def main():
+    parser = argparse.ArgumentParser(description='生成合成订单导出文件')
+    parser.add_argument('-o', '--output', required=True, help='输出文件路径，扩展名为 .xls（HTML格式）或 .xlsx')
+    parser.add_argument('--rows', type=int, default=10000, help='数据行数 (默认: 10000)')
+    parser.add_argument('--images', type=int, default=500, help='不同商品图片的数量，0 表示不生成图片URL (默认: 500)')
+    parser.add_argument('--image-base', default='http://127.0.0.1:8765',
+                        help='商品图片URL的前缀，指向 image_server.py (默认: http://127.0.0.1:8765)')
+    parser.add_argument('--seed', type=int, default=0, help='随机种子 (默认: 0)')
+    args = parser.parse_args()
+
+    generate_export(args.output, args.rows, seed=args.seed, images=args.images, image_base=args.image_base)
+    print(f"已生成 {args.rows} 行: {args.output} ({os.path.getsize(args.output) / 1024 / 1024:.1f} MB)")
+
+
+if __name__ == '__main__':
+    main()
@@ -6,45 +6,1125 @@
 """
 
 import argparse
-import pandas as pd
+import contextlib
+import glob
 import sys
 import os
-import requests
+import random
 import time
-from openpyxl.drawing import image as xl_image
 import hashlib
-from concurrent.futures import ThreadPoolExecutor, as_completed
+import io
+import json
+import multiprocessing
+import operator
+import re
+import sqlite3
+import threading
+import uuid
+from datetime import date, datetime
+from decimal import Decimal, InvalidOperation
+from itertools import islice
+from collections import OrderedDict
+from concurrent.futures import BrokenExecutor, Executor, Future, ProcessPoolExecutor, ThreadPoolExecutor, as_completed
 from urllib.parse import urlparse
 
-try:
-    from PIL import Image
-    PIL_AVAILABLE = True
-except ImportError:
-    PIL_AVAILABLE = False
+# pandas、numpy、requests、openpyxl、lxml、PIL 在用到它们的函数中按需导入，
+# --help 和 --list-columns 不需要为这些依赖付出导入时间
+
+
+def _pil_available():
+    """Pillow 是否已安装"""
+    try:
+        from PIL import Image  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+def _peak_rss_bytes():
+    """当前进程的内存峰值（字节），无法获取时返回None"""
+    try:
+        import resource
+    except ImportError:
+        resource = None
+    if resource is not None:
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # macOS 返回字节，Linux 返回KB
+        return peak if sys.platform == 'darwin' else peak * 1024
+    if sys.platform == 'win32':
+        import ctypes
+        from ctypes import wintypes
+
+        class PROCESS_MEMORY_COUNTERS(ctypes.Structure):
+            _fields_ = [('cb', wintypes.DWORD), ('PageFaultCount', wintypes.DWORD),
+                        ('PeakWorkingSetSize', ctypes.c_size_t), ('WorkingSetSize', ctypes.c_size_t),
+                        ('QuotaPeakPagedPoolUsage', ctypes.c_size_t), ('QuotaPagedPoolUsage', ctypes.c_size_t),
+                        ('QuotaPeakNonPagedPoolUsage', ctypes.c_size_t),
+                        ('QuotaNonPagedPoolUsage', ctypes.c_size_t),
+                        ('PagefileUsage', ctypes.c_size_t), ('PeakPagefileUsage', ctypes.c_size_t)]
+
+        counters = PROCESS_MEMORY_COUNTERS()
+        counters.cb = ctypes.sizeof(counters)
+        if ctypes.windll.psapi.GetProcessMemoryInfo(ctypes.windll.kernel32.GetCurrentProcess(),
+                                                     ctypes.byref(counters), counters.cb):
+            return counters.PeakWorkingSetSize
+    return None
+
+
+class StageProfiler:
+    """按处理阶段记录耗时、行数、吞吐量、下载字节数、缓存命中率和内存峰值
+
+    阶段可以嵌套，每个阶段只统计自身的耗时（不含嵌套在其中的子阶段）。
+    下载和图片转换在后台与其他阶段同时进行，通过 add 记录各自的墙钟时间，与其他阶段的耗时有重叠。
+    """
+
+    STAGE_LABELS = {
+        'resolve_columns': '解析列选择',
+        'read': '读取文件',
+        'normalize_ids': 'ID列规范化',
+        'parse_cache_load': '加载解析缓存',
+        'parse_cache_store': '写入解析缓存',
+        'filter_rows': '行过滤',
+        'incremental_filter': '筛选新增行',
+        'select_columns': '选择列',
+        'write_sheet': '写入工作表',
+        'format_cells': '设置ID列格式',
+        'wait_images': '等待图片',
+        'insert_images': '插入图片',
+        'save_workbook': '保存工作簿',
+        'write_output': '写出文件',
+        'download': '下载图片',
+        'convert_images': '图片转换',
+    }
+    # 可以在多次调用和多个文件之间累加的统计值
+    ADDITIVE_KEYS = ('seconds', 'calls', 'rows', 'bytes', 'items', 'cache_hits', 'failed')
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.started_at = time.time()
+        self.stages = {}
+        # 批处理时每个文件的统计结果
+        self.files = []
+        self._lock = threading.Lock()
+        self._local = threading.local()
+
+    @contextlib.contextmanager
+    def stage(self, name):
+        """统计一个阶段的耗时；可以在产出的字典中填写 rows、bytes 等统计值"""
+        stack = self._local.__dict__.setdefault('stack', [])
+        frame = [time.perf_counter(), 0.0]
+        stats = {}
+        stack.append(frame)
+        try:
+            yield stats
+        finally:
+            stack.pop()
+            elapsed = time.perf_counter() - frame[0]
+            if stack:
+                stack[-1][1] += elapsed
+            self.add(name, seconds=elapsed - frame[1], calls=1, **stats)
+
+    def add(self, name, peak_rss_bytes=None, **values):
+        """累加一个阶段的统计值，并记录此时的内存峰值"""
+        if peak_rss_bytes is None:
+            peak_rss_bytes = _peak_rss_bytes()
+        with self._lock:
+            entry = self.stages.setdefault(name, {})
+            for key, value in values.items():
+                entry[key] = entry.get(key, 0) + value
+            if peak_rss_bytes is not None:
+                entry['peak_rss_bytes'] = max(entry.get('peak_rss_bytes', 0), peak_rss_bytes)
+
+    def merge(self, summary, **file_info):
+        """合并一个文件的统计结果（summary 的返回值），用于批处理汇总；file_info 记录在 files 中"""
+        self.files.append(dict(file_info, **summary))
+        for stage in summary['stages']:
+            values = {key: stage[key] for key in self.ADDITIVE_KEYS if key in stage}
+            self.add(stage['name'], peak_rss_bytes=stage.get('peak_rss_bytes'), **values)
+
+    def summary(self):
+        """返回可以序列化为JSON的统计结果"""
+        stages = []
+        with self._lock:
+            entries = [(name, dict(entry)) for name, entry in self.stages.items()]
+        for name, entry in entries:
+            item = {'name': name, 'label': self.STAGE_LABELS.get(name, name)}
+            item.update(entry)
+            seconds = entry.get('seconds') or 0
+            if entry.get('rows') and seconds:
+                item['rows_per_sec'] = entry['rows'] / seconds
+            if entry.get('bytes') and seconds:
+                item['mb_per_sec'] = entry['bytes'] / 1024 / 1024 / seconds
+            if 'cache_hits' in entry and entry.get('items'):
+                item['cache_hit_rate'] = entry['cache_hits'] / entry['items']
+            stages.append(item)
+        peaks = [item['peak_rss_bytes'] for item in stages if item.get('peak_rss_bytes')]
+        current_peak = _peak_rss_bytes()
+        if current_peak:
+            peaks.append(current_peak)
+        peaks.extend(item['peak_rss_bytes'] for item in self.files if item.get('peak_rss_bytes'))
+        summary = {
+            'version': 1,
+            'started_at': datetime.fromtimestamp(self.started_at).isoformat(timespec='seconds'),
+            'total_seconds': time.perf_counter() - self.started,
+            'peak_rss_bytes': max(peaks) if peaks else None,
+            'stages': stages,
+        }
+        if self.files:
+            summary['files'] = list(self.files)
+        return summary
+
+
+def print_profile(summary):
+    """以表格形式打印性能统计"""
+    def pad(text, width):
+        # 中文字符按两个字符宽度对齐
+        return text + ' ' * max(0, width - sum(2 if ord(ch) > 127 else 1 for ch in text))
+
+    total = summary['total_seconds'] or 1e-9
+    print("\n性能统计:")
+    print("=" * 78)
+    print(f"{pad('阶段', 14)}{pad('耗时(秒)', 10)}{pad('占比', 8)}{pad('行数', 10)}{pad('行/秒', 10)}其他")
+    for stage in sorted(summary['stages'], key=lambda item: item.get('seconds', 0), reverse=True):
+        seconds = stage.get('seconds', 0)
+        rate = f"{stage['rows_per_sec']:.0f}" if 'rows_per_sec' in stage else ''
+        extra = []
+        if stage.get('items'):
+            extra.append(f"{stage['items']} 项")
+        if stage.get('bytes'):
+            extra.append(f"{stage['bytes'] / 1024 / 1024:.2f} MB")
+        if stage.get('mb_per_sec'):
+            extra.append(f"{stage['mb_per_sec']:.2f} MB/秒")
+        if 'cache_hit_rate' in stage:
+            extra.append(f"缓存命中率 {stage['cache_hit_rate']:.1%}")
+        if stage.get('failed'):
+            extra.append(f"失败 {stage['failed']}")
+        if stage.get('peak_rss_bytes'):
+            extra.append(f"内存峰值 {stage['peak_rss_bytes'] / 1024 / 1024:.0f} MB")
+        print(f"{pad(stage['label'], 14)}{seconds:<10.2f}{seconds / total:<8.1%}"
+              f"{str(stage.get('rows') or ''):<10}{rate:<10}{', '.join(extra)}")
+    print("-" * 78)
+    peak = summary.get('peak_rss_bytes')
+    print(f"总耗时: {summary['total_seconds']:.2f} 秒"
+          + (f"，内存峰值: {peak / 1024 / 1024:.0f} MB" if peak else ""))
+    if summary.get('files'):
+        print(f"批处理 {len(summary['files'])} 个文件：各阶段耗时为所有工作进程的累计值，占比可能超过100%")
+    print("=" * 78)
+
+
+def report_profile(summary, show=False, stats_json=None, **run_info):
+    """输出性能统计：show 为True时打印表格，指定 stats_json 时连同 run_info（输入、输出、是否成功等）写入JSON文件"""
+    if show:
+        print_profile(summary)
+    if stats_json:
+        try:
+            with open(stats_json, 'w', encoding='utf-8') as f:
+                json.dump(dict(run_info, **summary), f, ensure_ascii=False, indent=2)
+            print(f"性能统计已写入: {stats_json}")
+        except OSError as e:
+            print(f"写入性能统计失败: {e}")
+
+
+# 当前启用的性能统计，由 --profile / --stats-json 开启；未开启时为None，各阶段的统计不产生开销
+_profiler = None
+
+
+def enable_profiling():
+    """开启性能统计，返回新的 StageProfiler"""
+    global _profiler
+    _profiler = StageProfiler()
+    return _profiler
+
+
+def disable_profiling():
+    """关闭性能统计"""
+    global _profiler
+    _profiler = None
+
+
+def profile_stage(name):
+    """统计一个阶段的耗时；未开启性能统计时不做任何事"""
+    if _profiler is None:
+        return contextlib.nullcontext({})
+    return _profiler.stage(name)
+
+
+def profile_add(name, **values):
+    """累加一个阶段的统计值；未开启性能统计时不做任何事"""
+    if _profiler is not None:
+        _profiler.add(name, **values)
+
+
+# 流式读取HTML表格时每个数据块的默认行数
+HTML_CHUNK_SIZE = 10000
+
+# 可能包含长数字的ID列，按字符串读取并在导出时设置为文本格式，避免科学计数法
+DEFAULT_ID_COLUMNS = ['主订单号', '子订单号', '店铺ID', '商品ID', '规格编号',
+                      '采购订单号', '平台物流单号', '手机号', '商户订单号']
+
+# 商品图片URL所在的列，--download-images 时下载这些图片并嵌入xlsx
+IMAGE_COLUMN = '商品图片'
+
+# 以科学计数法书写的数字文本，例如 1.0075927664419E+15
+_SCI_NOTATION_PATTERN = r'[+-]?\d+(?:\.\d+)?[eE][+-]?\d+'
+
+# 与 pd.read_html 相同的空白字符规则
+_WHITESPACE_RE = re.compile(r'[\s\xa0]+')
+
+
+def _clean_cell_text(text):
+    """合并单元格文本中的连续空白并去除首尾空白（与 pd.read_html 保持一致）"""
+    return _WHITESPACE_RE.sub(' ', text).strip()
+
+
+def _mangle_duplicate_columns(names):
+    """按 pandas 的规则处理表头：空列名改为 Unnamed: N，重复列名追加 .1、.2 后缀"""
+    names = [name if name else f"Unnamed: {i}" for i, name in enumerate(names)]
+    counts = {}
+    for i, name in enumerate(names):
+        count = counts.get(name, 0)
+        while count > 0:
+            counts[name] = count + 1
+            name = f"{name}.{count}"
+            count = counts.get(name, 0)
+        names[i] = name
+        counts[name] = count + 1
+    return names
+
+
+# 流式读取HTML表格时每次从文件读取的字节数
+HTML_BLOCK_SIZE = 4 * 1024 * 1024
+
+_TR_END_RE = re.compile(rb'</tr\s*>', re.IGNORECASE)
+_TABLE_END_RE = re.compile(rb'</table\s*>', re.IGNORECASE)
+
+
+def _last_row_end(buffer, start=0, end=None):
+    """buffer 中最后一个 </tr> 结束的位置，没有时返回None"""
+    last = None
+    for last in _TR_END_RE.finditer(buffer, start, len(buffer) if end is None else end):
+        pass
+    return last.end() if last is not None else None
+
+
+def _iter_html_segments(file_path, block_size=HTML_BLOCK_SIZE, start=0):
+    """按 </tr> 边界把文件切分为若干段字节，读到第一个 </table> 为止
+
+    从文件开头读取时，第一段包含文件头部和 <table> 开始标签，之后每段只包含完整的 <tr>…</tr>。
+    各段在文件中首尾相接，最后一段到最后一个 </tr> 为止（之后只有空白和结束标签），
+    因此所有段的总长度就是下次追加读取时的续读位置。start 为开始读取的字节位置。
+    """
+    buffer = b''
+    # 没有任何完整行的表格（只有 <table> 标签）也要把文件头部交给解析器
+    whole_first = start == 0
+    with open(file_path, 'rb') as f:
+        f.seek(start)
+        while True:
+            data = f.read(block_size)
+            # 只在新读入的部分（加上可能跨块的标签）中查找，避免重复扫描
+            scan_from = max(0, len(buffer) - 16)
+            buffer += data
+            table_end = _TABLE_END_RE.search(buffer, scan_from)
+            if table_end or not data:
+                limit = table_end.start() if table_end else len(buffer)
+                last_end = _last_row_end(buffer, 0, limit)
+                if last_end is None:
+                    last_end = limit if whole_first else 0
+                yield buffer[:last_end]
+                return
+            last_end = _last_row_end(buffer, scan_from)
+            if last_end is not None:
+                yield buffer[:last_end]
+                buffer = buffer[last_end:]
+                whole_first = False
+
+
+class HtmlResumePoint:
+    """HTML表格的续读位置，用于增量导出
+
+    offset 为已解析内容的字节长度（到最后一个完整 </tr> 为止），digest 为文件前 offset 字节的SHA-256。
+    平台导出文件追加新订单时，之前的内容不变，新行插在 </table> 之前；
+    只要文件前 offset 字节的哈希不变，就可以从 offset 处继续解析，只解析新增的行。
+    """
+
+    def __init__(self, offset=0, digest=None):
+        self.offset = offset
+        self.digest = digest if digest is not None else hashlib.sha256()
+
+    @classmethod
+    def verify(cls, file_path, offset, expected_hash):
+        """校验文件前 offset 字节的哈希，一致时返回该位置的续读点，否则返回从头开始的续读点"""
+        if offset and expected_hash and os.path.getsize(file_path) >= offset:
+            digest = hashlib.sha256()
+            with open(file_path, 'rb') as f:
+                remaining = offset
+                while remaining:
+                    data = f.read(min(remaining, HTML_BLOCK_SIZE))
+                    if not data:
+                        break
+                    digest.update(data)
+                    remaining -= len(data)
+            if digest.hexdigest() == expected_hash:
+                return cls(offset, digest)
+        return cls()
+
+    def feed(self, segment):
+        """记录已读取的一段内容"""
+        self.digest.update(segment)
+        self.offset += len(segment)
+
+    def hexdigest(self):
+        return self.digest.hexdigest()
+
+
+def iter_html_table_rows(file_path, encoding='utf-8', resume=None, positions=None):
+    """逐行流式解析HTML文件中的第一个表格，每次产出一行单元格文本列表
+
+    文件按 </tr> 边界分段读取，每段使用新的 lxml 解析器增量解析，每处理完一行立即从树中清除。
+    libxml2 的HTML增量解析器会一直保留已读入的内容，分段解析使内存占用只与段大小有关，
+    不随文件大小增长；读到第一个 </table> 后即停止。
+    resume 为 HtmlResumePoint 时从其位置开始读取（不含表头），并随读取进度更新续读位置。
+    positions 为列位置列表时，每行只产出这些位置的单元格（按 positions 的顺序，缺失的补为空字符串），
+    只为这些单元格提取文本，读完最后一个需要的位置后跳过该行其余的单元格。
+    """
+    from lxml import etree
+
+    targets = last = None
+    if positions is not None:
+        # 列位置 -> 该列在产出的行中的下标
+        targets = {}
+        for index, position in enumerate(positions):
+            targets.setdefault(position, []).append(index)
+        last = max(positions, default=-1)
+    
+    start = resume.offset if resume is not None else 0
+    first = start == 0
+    for segment in _iter_html_segments(file_path, start=start):
+        if resume is not None:
+            resume.feed(segment)
+        if not segment.strip():
+            continue
+        if not first:
+            segment = b'<table>' + segment + b'</table>'
+        first = False
+
+        context = etree.iterparse(io.BytesIO(segment), events=('end',), tag='tr',
+                                  html=True, encoding=encoding, huge_tree=True)
+        try:
+            for _, elem in context:
+                yield _row_cells(elem) if positions is None else _project_cells(elem, targets, last)
+
+                # 释放已处理的行，避免整段DOM树常驻内存
+                elem.clear()
+                while elem.getprevious() is not None:
+                    del elem.getparent()[0]
+        finally:
+            del context
+
+
+def _cell_colspan(cell):
+    """单元格占用的列数"""
+    try:
+        return max(int(cell.get('colspan') or 1), 1)
+    except ValueError:
+        return 1
+
+
+def _row_cells(elem):
+    """<tr> 中所有单元格的文本，colspan 大于1的单元格重复相应次数"""
+    row = []
+    for cell in elem:
+        # 跳过注释等非元素节点
+        if cell.tag not in ('td', 'th'):
+            continue
+        row.extend([_clean_cell_text(''.join(cell.itertext()))] * _cell_colspan(cell))
+    return row
+
+
+def _project_cells(elem, targets, last):
+    """只提取 targets（列位置 -> 产出的下标列表）中列位置的单元格文本，其余单元格只计算所占的列数"""
+    row = [''] * sum(len(indexes) for indexes in targets.values())
+    position = 0
+    for cell in elem:
+        if position > last:
+            break
+        if cell.tag not in ('td', 'th'):
+            continue
+        span = _cell_colspan(cell)
+        text = None
+        for covered in range(position, position + span):
+            indexes = targets.get(covered)
+            if indexes:
+                if text is None:
+                    text = _clean_cell_text(''.join(cell.itertext()))
+                for index in indexes:
+                    row[index] = text
+        position += span
+    return row
+
+
+def _rows_to_frame(rows, names, dtype=None):
+    """将文本行转换为DataFrame，类型推断规则与 pd.read_html / pd.read_excel 相同"""
+    import pandas as pd
+    from pandas.io.parsers import TextParser
+
+    if not rows:
+        # dtype 可能是按列指定的字典，空表需要逐列转换
+        df = pd.DataFrame(columns=names)
+        return df.astype(dtype) if dtype is not None else df
+    # 列投影后可能只剩一列，此时不能把空单元格当作空行丢弃
+    with TextParser(rows, header=None, names=names, dtype=dtype,
+                    skip_blank_lines=False) as parser:
+        return parser.read()
+
+
+def _infer_frame_types(df, str_columns=()):
+    """对按单元格文本读取的DataFrame做与直接读取时相同的类型推断，str_columns 中的列保持文本"""
+    names = list(df.columns)
+    rows = df.astype(object).where(df.notna(), '').values.tolist()
+    dtype = {col: str for col in names if col in str_columns} or None
+    return _rows_to_frame(rows, names, dtype=dtype)
+
+
+def _iter_frame_chunks(rows, names, chunksize, dtype=None):
+    """按 chunksize 行分块产出DataFrame"""
+    while True:
+        chunk = list(islice(rows, chunksize))
+        if not chunk:
+            break
+        yield _rows_to_frame(chunk, names, dtype=dtype)
+
+
+def read_html_table_streaming(file_path, usecols=None, chunksize=None, encoding='utf-8',
+                              str_columns=None, filters=None, resume=None):
+    """流式读取伪装成 .xls 的HTML表格
+
+    只解析文件中的第一个表格，并且只保留 usecols 中的列（None 表示全部列）。
+    str_columns 中的列直接按字符串读取，不做数值类型推断；为 True 时所有列都按字符串读取。
+    filters 为 RowFilter 列表，不满足条件的行在列投影和类型推断之前就被丢弃。
+    chunksize 为 None 时返回完整的DataFrame，否则返回按块产出DataFrame的迭代器。
+    resume 为 HtmlResumePoint 时只解析续读位置之后的行（增量导出）。
+    """
+    # 先单独读取表头（只解析文件开头的第一行），确定需要提取文本的列
+    header_rows = iter_html_table_rows(file_path, encoding=encoding)
+    try:
+        header = next(header_rows, None)
+    finally:
+        header_rows.close()
+    if header is None:
+        raise ValueError("文件中没有找到表格")
+
+    columns = _mangle_duplicate_columns(header)
+    positions = _resolve_positions(columns, usecols)
+    names = [columns[p] for p in positions]
+    if str_columns is True:
+        str_columns = names
+    dtype = {col: str for col in names if col in (str_columns or ())} or None
+
+    # 过滤条件用到的列跟在选中的列之后一起提取，判断完后再去掉
+    read_positions = list(positions)
+    for row_filter in filters or ():
+        if row_filter.column in columns and columns.index(row_filter.column) not in read_positions:
+            read_positions.append(columns.index(row_filter.column))
+    predicate = compile_row_filters(filters, [columns[p] for p in read_positions]) if filters else None
+
+    rows = iter_html_table_rows(file_path, encoding=encoding, resume=resume, positions=read_positions)
+    if resume is None or not resume.offset:
+        # 从文件开头读取时第一行是表头
+        next(rows, None)
+    if predicate is not None:
+        rows = filter(predicate, rows)
+    projected = rows
+    if len(read_positions) > len(positions):
+        projected = (row[:len(positions)] for row in rows)
+    if chunksize is None:
+        return _rows_to_frame(list(projected), names, dtype=dtype)
+    return _iter_frame_chunks(projected, names, chunksize, dtype=dtype)
+
+
+def _resolve_positions(columns, usecols):
+    """将要读取的列名转换为列位置，None 表示全部列"""
+    if usecols is None:
+        return list(range(len(columns)))
+    missing = [col for col in usecols if col not in columns]
+    if missing:
+        raise ValueError(f"列不存在: {missing}")
+    return [columns.index(col) for col in usecols]
+
+
+def _filter_text(value):
+    """单元格值的文本形式，用于等值和正则匹配；空值为空字符串"""
+    if value is None:
+        return ''
+    if isinstance(value, float):
+        if value != value:
+            return ''
+        if value.is_integer():
+            return str(int(value))
+    return str(value)
+
+
+def _parse_decimal(value):
+    """将单元格值解析为 Decimal，不是有限数字时返回None"""
+    if isinstance(value, bool):
+        return None
+    try:
+        number = Decimal(str(value).strip())
+    except (InvalidOperation, ValueError):
+        return None
+    return number if number.is_finite() else None
+
+
+def _parse_datetime(value):
+    """将单元格值解析为 datetime，支持 2024-01-31、2024/01/31 12:00:00 等写法；无法解析时返回None"""
+    if isinstance(value, datetime):
+        return value
+    if isinstance(value, date):
+        return datetime(value.year, value.month, value.day)
+    text = str(value).strip()
+    if not text:
+        return None
+    try:
+        return datetime.fromisoformat(text.replace('/', '-'))
+    except ValueError:
+        return None
+
+
+class RowFilter:
+    """行过滤条件，格式为 "列名 运算符 值"
+
+    支持的运算符：
+      =  / !=   等于 / 不等于，值用 | 分隔时表示在列表中 / 不在列表中（如 平台=Shopee|Lazada）
+      > >= < <= 数值或日期范围：值是数字时按数值比较，是日期时按日期时间比较，否则按文本比较
+      ~  / !~   正则表达式匹配 / 不匹配（在单元格文本中搜索）
+    等值比较时文本相同即匹配，两边都是数字时按数值相等匹配（1 与 1.0 相等，长ID不丢失精度）。
+    """
+
+    # 按长度排列，保证 != >= <= !~ 优先于 = > < ~ 匹配
+    OPERATORS = ('!=', '>=', '<=', '!~', '=', '>', '<', '~')
+    _EXPR_RE = re.compile(r'^\s*(.+?)\s*(' + '|'.join(re.escape(op) for op in OPERATORS) + r')\s*(.*?)\s*$')
+    _COMPARE = {'>': operator.gt, '>=': operator.ge, '<': operator.lt, '<=': operator.le}
+
+    def __init__(self, column, op, value):
+        if op not in self.OPERATORS:
+            raise ValueError(f"不支持的运算符: {op}")
+        self.column = column
+        self.op = op
+        self.value = value
+        if op in ('=', '!='):
+            self.targets = [(target, _parse_decimal(target)) for target in value.split('|')]
+        elif op in ('~', '!~'):
+            try:
+                self.pattern = re.compile(value)
+            except re.error as e:
+                raise ValueError(f"无效的正则表达式 '{value}': {e}")
+        else:
+            self.number = _parse_decimal(value)
+            self.datetime = _parse_datetime(value) if self.number is None else None
+
+    @classmethod
+    def parse(cls, expression):
+        """解析过滤表达式，例如 站点=PH、买家付款金额（RMB）>=100、订单状态~已发货|已完成"""
+        match = cls._EXPR_RE.match(expression)
+        if not match:
+            raise ValueError(f"无法解析过滤条件: {expression}（格式: 列名 运算符 值）")
+        return cls(*match.groups())
+
+    def __str__(self):
+        return f"{self.column}{self.op}{self.value}"
+
+    def matches(self, value):
+        """判断单元格值是否满足条件"""
+        text = _filter_text(value)
+        if self.op in ('=', '!='):
+            number = None
+            hit = False
+            for target, target_number in self.targets:
+                if text == target:
+                    hit = True
+                    break
+                if target_number is not None:
+                    if number is None:
+                        number = _parse_decimal(text) if text else False
+                    if number is not False and number == target_number:
+                        hit = True
+                        break
+            return hit if self.op == '=' else not hit
+
+        if self.op in ('~', '!~'):
+            hit = self.pattern.search(text) is not None
+            return hit if self.op == '~' else not hit
+
+        compare = self._COMPARE[self.op]
+        if self.number is not None:
+            left = _parse_decimal(text) if text else None
+            return left is not None and compare(left, self.number)
+        if self.datetime is not None:
+            left = _parse_datetime(value)
+            return left is not None and compare(left, self.datetime)
+        return compare(text, self.value)
+
+
+def compile_row_filters(filters, columns):
+    """将过滤条件编译为作用于原始行（单元格值列表）的判断函数，所有条件同时满足时返回True"""
+    missing = [f.column for f in filters if f.column not in columns]
+    if missing:
+        raise ValueError(f"过滤条件中的列不存在: {missing}")
+    checks = [(columns.index(f.column), f) for f in filters]
+
+    def predicate(row):
+        width = len(row)
+        for position, row_filter in checks:
+            if not row_filter.matches(row[position] if position < width else ''):
+                return False
+        return True
+    return predicate
+
+
+def apply_row_filters(df, filters):
+    """在已读取的DataFrame上按过滤条件筛选行，返回重新编号的DataFrame"""
+    missing = [f.column for f in filters if f.column not in df.columns]
+    if missing:
+        raise ValueError(f"过滤条件中的列不存在: {missing}")
+    mask = None
+    for row_filter in filters:
+        column_mask = df[row_filter.column].map(row_filter.matches).astype(bool)
+        mask = column_mask if mask is None else mask & column_mask
+    return df[mask].reset_index(drop=True)
+
+
+def check_filter_columns(filters, available_columns):
+    """检查过滤条件中的列是否都存在，不存在时打印错误并返回False
+
+    在打开输出文件之前调用；读取时才发现列不存在会在输出文件已被清空之后失败。
+    """
+    missing = [f.column for f in filters or () if f.column not in available_columns]
+    if missing:
+        print(f"错误: 过滤条件中的列不存在: {', '.join(missing)}")
+        return False
+    return True
+
+
+def _convert_xlsx_value(value):
+    """按 pd.read_excel 的规则转换openpyxl单元格的值"""
+    if value is None:
+        return ''
+    if isinstance(value, float) and value.is_integer():
+        return int(value)
+    return value
+
+
+def _iter_xlsx_rows(file_path):
+    """以只读模式逐行读取xlsx第一个工作表，每次产出一行转换后的值"""
+    from openpyxl import load_workbook
+
+    workbook = load_workbook(file_path, read_only=True, data_only=True, keep_links=False)
+    try:
+        sheet = workbook.worksheets[0]
+        sheet.reset_dimensions()
+        for row in sheet.iter_rows(values_only=True):
+            yield [_convert_xlsx_value(value) for value in row]
+    finally:
+        workbook.close()
 
 
-def read_excel_file(file_path):
-    """读取Excel文件"""
+def read_xlsx_streaming(file_path, usecols=None, filters=None, chunksize=None):
+    """以只读模式读取xlsx文件，只保留 usecols 中的列（None 表示全部列），所有值按字符串读取
+
+    filters 为 RowFilter 列表，不满足条件的行在读取时直接丢弃。
+    chunksize 为 None 时返回完整的DataFrame，否则返回按块产出DataFrame的迭代器。
+    """
+    rows = _iter_xlsx_rows(file_path)
+    header = next(rows, None)
+    if header is None:
+        raise ValueError("工作表为空")
+
+    columns = _mangle_duplicate_columns([str(value) for value in header])
+    positions = _resolve_positions(columns, usecols)
+    names = [columns[p] for p in positions]
+    predicate = compile_row_filters(filters, columns) if filters else None
+
+    def data_rows():
+        for row in rows:
+            # 与 pd.read_excel 一致，整行为空的行直接跳过
+            if not any(value != '' for value in row):
+                continue
+            if predicate is not None and not predicate(row):
+                continue
+            width = len(row)
+            yield [row[p] if p < width else '' for p in positions]
+
+    if chunksize is None:
+        return _rows_to_frame(list(data_rows()), names, dtype=str)
+    return _iter_frame_chunks(data_rows(), names, chunksize, dtype=str)
+
+
+def read_column_names(file_path):
+    """只读取表头行，返回所有列名（与 read_excel_file 得到的列名一致）
+
+    读到第一行后立即停止，不解析数据行，也不需要导入 pandas。
+    """
     try:
         if file_path.endswith('.xls'):
-            df = pd.read_html(file_path, encoding='utf-8', header=0)[0]
+            rows = iter_html_table_rows(file_path)
         else:
-            df = pd.read_excel(file_path, dtype=str)
-        
-        # 将可能包含长数字的列转换为字符串，避免科学计数法
-        id_columns = ['主订单号', '子订单号', '店铺ID', '商品ID', '规格编号', 
-                     '采购订单号', '平台物流单号', '手机号', '商户订单号']
-        
-        for col in id_columns:
-            if col in df.columns:
-                # 确保转换为字符串并处理科学计数法
-                df[col] = pd.to_numeric(df[col], errors='coerce').fillna(df[col])
-                df[col] = df[col].apply(lambda x: f"{x:.0f}" if pd.notna(x) and isinstance(x, (int, float)) else str(x))
-                # 移除可能的 .0 后缀和 nan 值
-                df[col] = df[col].astype(str).str.replace(r'\.0$', '', regex=True)
-                df[col] = df[col].replace('nan', '')
+            rows = _iter_xlsx_rows(file_path)
+        try:
+            header = next(rows, None)
+        finally:
+            # 关闭生成器，立即释放文件句柄
+            rows.close()
+        if header is not None and not file_path.endswith('.xls'):
+            header = [str(value) for value in header]
+        if header is None:
+            raise ValueError("文件中没有找到表头")
+        return _mangle_duplicate_columns(header)
+
+    except Exception as e:
+        print(f"读取表头失败: {e}")
+        return None
+
+
+def _format_sci_notation(value):
+    """将科学计数法文本展开为完整的整数文本"""
+    try:
+        return format(Decimal(value), 'f')
+    except InvalidOperation:
+        return value
+
+
+def normalize_id_columns(df, id_columns=None):
+    """规范化长数字ID列：统一为字符串，去除 .0 后缀，空值替换为空字符串
+
+    ID列在读取时已按字符串读取，这里只做向量化的字符串处理，
+    不经过浮点数转换，19位订单号也不会丢失精度。
+    """
+    if id_columns is None:
+        id_columns = DEFAULT_ID_COLUMNS
+
+    for col in id_columns:
+        if col not in df.columns:
+            continue
+        values = df[col].fillna('').astype(str)
+        # 绝大多数ID是纯数字，无需处理；只对其余非空单元格做后续检查
+        pending = ~values.str.isdigit() & (values != '')
+        if pending.any():
+            fixed = values[pending].str.replace(r'\.0$', '', regex=True)
+            # 个别导出文件会把ID写成科学计数法文本，只对这些单元格逐个展开
+            sci_mask = fixed.str.fullmatch(_SCI_NOTATION_PATTERN)
+            if sci_mask.any():
+                fixed[sci_mask] = fixed[sci_mask].map(_format_sci_notation)
+            values[pending] = fixed
+        df[col] = values
+    return df
+
+
+def _import_feather():
+    """按需导入 pyarrow.feather，未安装时返回None"""
+    try:
+        from pyarrow import feather
+    except ImportError:
+        return None
+    return feather
+
+
+class ParseCache:
+    """输入文件解析结果缓存
+
+    将解析并规范化ID列之后的完整DataFrame以 Arrow/Feather（不压缩）格式保存在缓存目录中，
+    之后的运行通过内存映射只加载选中的列，不再重新解析原始文件。
+    缓存按文件内容的SHA-256哈希寻址，sqlite索引记录每个路径的大小和修改时间，
+    两者都未变化时直接使用记录的哈希，不再重新读取整个文件计算。
+    需要安装 pyarrow；未安装时缓存不可用，读取退回到直接解析。
+    """
+
+    INDEX_NAME = 'index.sqlite3'
+    TEMP_SUFFIX = '.part'
+    # 读取/规范化逻辑变化时递增，使旧的缓存自动失效
+    FORMAT_VERSION = 1
+    HASH_CHUNK_SIZE = 1024 * 1024
+
+    def __init__(self, cache_dir='.parse_cache'):
+        self.cache_dir = cache_dir
+        self.feather = _import_feather()
+        self.hits = 0
+        self.misses = 0
+        self._conn = None
+        if self.feather is None:
+            print("提示: 未安装 pyarrow，解析缓存不可用 (pip install pyarrow)")
+            return
+        os.makedirs(cache_dir, exist_ok=True)
+        self._conn = sqlite3.connect(os.path.join(cache_dir, self.INDEX_NAME), timeout=30)
+        with self._conn:
+            self._conn.execute("""
+                CREATE TABLE IF NOT EXISTS files (
+                    path TEXT PRIMARY KEY,
+                    size INTEGER NOT NULL,
+                    mtime_ns INTEGER NOT NULL,
+                    content_hash TEXT NOT NULL
+                )
+            """)
+            self._conn.execute("""
+                CREATE TABLE IF NOT EXISTS frames (
+                    frame_key TEXT PRIMARY KEY,
+                    content_hash TEXT NOT NULL,
+                    filename TEXT NOT NULL,
+                    size INTEGER NOT NULL,
+                    rows INTEGER NOT NULL,
+                    created_at REAL NOT NULL,
+                    last_access REAL NOT NULL
+                )
+            """)
+
+    @property
+    def available(self):
+        """缓存是否可用（已安装 pyarrow）"""
+        return self._conn is not None
+
+    def fingerprint(self, file_path):
+        """返回文件内容的SHA-256哈希；路径、大小和修改时间都未变化时直接使用索引中的记录"""
+        path = os.path.abspath(file_path)
+        stat = os.stat(path)
+        with self._conn:
+            row = self._conn.execute(
+                "SELECT size, mtime_ns, content_hash FROM files WHERE path = ?", (path,)).fetchone()
+        if row is not None and row[0] == stat.st_size and row[1] == stat.st_mtime_ns:
+            return row[2]
+
+        digest = hashlib.sha256()
+        with open(path, 'rb') as f:
+            for chunk in iter(lambda: f.read(self.HASH_CHUNK_SIZE), b''):
+                digest.update(chunk)
+        content_hash = digest.hexdigest()
+        with self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO files (path, size, mtime_ns, content_hash) VALUES (?, ?, ?, ?)",
+                (path, stat.st_size, stat.st_mtime_ns, content_hash))
+        return content_hash
+
+    def _frame_key(self, content_hash, id_columns, text=False):
+        """缓存键：文件内容哈希 + ID列配置 + 缓存格式版本；按单元格文本保存的结果另外加上标记"""
+        key = f"{content_hash}\0{','.join(id_columns)}\0{self.FORMAT_VERSION}"
+        if text:
+            key += "\0text"
+        return hashlib.sha256(key.encode('utf-8')).hexdigest()
+
+    def load(self, file_path, usecols=None, id_columns=DEFAULT_ID_COLUMNS, text=False):
+        """加载缓存的DataFrame，usecols 指定时只加载这些列；text 为True时加载按单元格文本保存的结果；未命中返回None"""
+        frame_key = self._frame_key(self.fingerprint(file_path), id_columns, text)
+        with self._conn:
+            row = self._conn.execute(
+                "SELECT filename FROM frames WHERE frame_key = ?", (frame_key,)).fetchone()
+            if row is not None:
+                self._conn.execute("UPDATE frames SET last_access = ? WHERE frame_key = ?",
+                                   (time.time(), frame_key))
+        if row is None or not os.path.exists(os.path.join(self.cache_dir, row[0])):
+            self.misses += 1
+            return None
+
+        path = os.path.join(self.cache_dir, row[0])
+        if usecols is not None:
+            schema_names = set(self.feather.read_table(path, columns=[], memory_map=True).schema.names)
+            if not schema_names.issuperset(usecols):
+                self.misses += 1
+                return None
+            usecols = list(usecols)
+        table = self.feather.read_table(path, columns=usecols, memory_map=True)
+        self.hits += 1
+        return table.to_pandas()
+
+    def store(self, file_path, df, id_columns=DEFAULT_ID_COLUMNS, text=False):
+        """保存完整的DataFrame；内容先写入临时文件，写完后原子重命名"""
+        content_hash = self.fingerprint(file_path)
+        frame_key = self._frame_key(content_hash, id_columns, text)
+        filename = f"{frame_key}.feather"
+        temp_path = os.path.join(self.cache_dir, f"{uuid.uuid4().hex}{self.TEMP_SUFFIX}")
+        try:
+            self.feather.write_feather(df.reset_index(drop=True), temp_path, compression='uncompressed')
+            os.replace(temp_path, os.path.join(self.cache_dir, filename))
+        except BaseException:
+            try:
+                os.remove(temp_path)
+            except OSError:
+                pass
+            raise
+
+        now = time.time()
+        with self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO frames "
+                "(frame_key, content_hash, filename, size, rows, created_at, last_access) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (frame_key, content_hash, filename,
+                 os.path.getsize(os.path.join(self.cache_dir, filename)), len(df), now, now))
+
+    def close(self):
+        """关闭索引数据库连接"""
+        if self._conn is not None:
+            self._conn.close()
+
+
+class FrameCache:
+    """内存中的解析结果缓存（服务模式使用）
+
+    与 ParseCache 的接口相同，可以直接作为 read_excel_file 的 parse_cache 参数：
+    未命中时解析全部列并保存，之后不同的列选择和过滤条件都直接从内存中的DataFrame取用。
+    缓存键为文件的绝对路径、大小、修改时间、ID列配置以及是否按单元格文本读取，文件被覆盖后自动失效。
+    max_bytes 为内存预算（按DataFrame的内存占用计算），超出时按最近最少使用（LRU）淘汰。
+    """
+
+    def __init__(self, max_bytes=None):
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.total_bytes = 0
+        self._frames = OrderedDict()
+        self._lock = threading.Lock()
+
+    @property
+    def available(self):
+        return True
+
+    def fingerprint(self, file_path):
+        """返回 (绝对路径, 大小, 修改时间)"""
+        path = os.path.abspath(file_path)
+        stat = os.stat(path)
+        return path, stat.st_size, stat.st_mtime_ns
+
+    def _key(self, file_path, id_columns, text=False):
+        return self.fingerprint(file_path) + (tuple(id_columns), text)
+
+    def contains(self, file_path, id_columns=DEFAULT_ID_COLUMNS, text=False):
+        """是否已缓存该文件（不更新命中统计和访问顺序）"""
+        with self._lock:
+            return self._key(file_path, id_columns, text) in self._frames
+
+    def load(self, file_path, usecols=None, id_columns=DEFAULT_ID_COLUMNS, text=False):
+        """返回缓存的DataFrame，usecols 指定时只取这些列；未命中返回None"""
+        key = self._key(file_path, id_columns, text)
+        with self._lock:
+            entry = self._frames.get(key)
+            if entry is None or (usecols is not None and not set(usecols).issubset(entry[0].columns)):
+                self.misses += 1
+                return None
+            self._frames.move_to_end(key)
+            self.hits += 1
+        df = entry[0]
+        return df[list(usecols)] if usecols is not None else df.copy(deep=False)
+
+    def store(self, file_path, df, id_columns=DEFAULT_ID_COLUMNS, text=False):
+        """保存完整的DataFrame，并淘汰同一路径的旧版本（大小或修改时间不同）和超出预算的条目
+
+        同一文件版本的类型推断结果和单元格文本（以及不同的ID列配置）是各自独立的条目，互不淘汰。
+        """
+        key = self._key(file_path, id_columns, text)
+        size = int(df.memory_usage(index=True, deep=True).sum())
+        if self.max_bytes is not None and size > self.max_bytes:
+            return
+        with self._lock:
+            for old_key in [k for k in self._frames if k[0] == key[0] and k[1:3] != key[1:3]]:
+                self.total_bytes -= self._frames.pop(old_key)[1]
+            self._frames[key] = (df, size)
+            self.total_bytes += size
+            while self.max_bytes is not None and self.total_bytes > self.max_bytes:
+                self.total_bytes -= self._frames.popitem(last=False)[1][1]
+
+    def stats(self):
+        """返回可以序列化为JSON的统计信息"""
+        with self._lock:
+            return {
+                'entries': len(self._frames),
+                'bytes': self.total_bytes,
+                'max_bytes': self.max_bytes,
+                'hits': self.hits,
+                'misses': self.misses,
+                'files': [key[0] for key in self._frames],
+            }
+
+    def close(self):
+        """清空缓存"""
+        with self._lock:
+            self._frames.clear()
+            self.total_bytes = 0
+
+
+def _read_excel_uncached(file_path, usecols, id_columns, filters=None, resume=None, text=False):
+    """解析输入文件并规范化ID列，过滤条件在流式读取时逐行判断
+
+    text 为True时所有列保留单元格文本，不做类型推断（xlsx输入总是按文本读取）。
+    """
+    with profile_stage('read') as stats:
+        if file_path.endswith('.xls'):
+            df = read_html_table_streaming(file_path, usecols=usecols, str_columns=True if text else id_columns,
+                                           filters=filters, resume=resume)
+        else:
+            df = read_xlsx_streaming(file_path, usecols=usecols, filters=filters)
+        stats.update(rows=len(df), bytes=os.path.getsize(file_path))
+    
+    # 将可能包含长数字的列规范为字符串，避免科学计数法
+    with profile_stage('normalize_ids') as stats:
+        normalize_id_columns(df, id_columns)
+        stats['rows'] = len(df)
+    return df
+
+
+def _read_excel_cached(file_path, usecols, id_columns, parse_cache, filters=None, text=False):
+    """通过解析缓存读取：命中时只加载选中的列和过滤条件用到的列；未命中时解析全部列并写入缓存
+
+    缓存中保存的是未过滤的完整数据，过滤条件在加载后对DataFrame判断。
+    text 为True时读取并缓存单元格文本（与类型推断的结果分别缓存），CSV/JSONL/Parquet 输出与不使用缓存时一致。
+    """
+    load_columns = usecols
+    if usecols is not None and filters:
+        load_columns = list(dict.fromkeys(list(usecols) + [f.column for f in filters]))
+
+    with profile_stage('parse_cache_load') as stats:
+        df = parse_cache.load(file_path, load_columns, id_columns, text=text)
+        if df is not None:
+            stats['rows'] = len(df)
+    if df is not None:
+        print(f"使用解析缓存: {file_path}")
+    else:
+        # 缓存保存全部列，之后不同的 -c 选择都可以命中
+        df = _read_excel_uncached(file_path, None, id_columns, text=text)
+        try:
+            with profile_stage('parse_cache_store') as stats:
+                parse_cache.store(file_path, df, id_columns, text=text)
+                stats['rows'] = len(df)
+        except Exception as e:
+            print(f"警告: 写入解析缓存失败: {e}")
+
+    if filters:
+        with profile_stage('filter_rows') as stats:
+            stats['rows'] = len(df)
+            df = apply_row_filters(df, filters)
+    if usecols is not None:
+        df = df[list(usecols)]
+    return df
+
+
+def read_excel_file(file_path, usecols=None, id_columns=None, parse_cache=None, filters=None,
+                    resume=None, text=False):
+    """读取Excel文件，usecols 指定时只读取这些列
+
+    id_columns 为需要按字符串保留的长数字ID列，默认为 DEFAULT_ID_COLUMNS。
+    parse_cache 为 ParseCache 时优先从解析缓存读取。
+    filters 为 RowFilter 列表，只保留同时满足所有条件的行。
+    resume 为 HtmlResumePoint 时只读取HTML表格中续读位置之后的行（不使用解析缓存）。
+    text 为True时所有列保留单元格文本，不做类型推断（与 read_excel_chunks 的结果一致）。
+    """
+    if id_columns is None:
+        id_columns = DEFAULT_ID_COLUMNS
+
+    try:
+        if parse_cache is not None and parse_cache.available and resume is None:
+            df = _read_excel_cached(file_path, usecols, id_columns, parse_cache, filters, text=text)
+        else:
+            df = _read_excel_uncached(file_path, usecols, id_columns, filters, resume, text=text)
         
         print(f"成功读取文件: {file_path}")
+        if filters:
+            print(f"行过滤条件: {' 且 '.join(str(f) for f in filters)}")
         print(f"数据形状: {df.shape[0]} 行 x {df.shape[1]} 列")
         return df
     
@@ -125,325 +1205,2582 @@ def get_columns_from_input(input_string, available_columns):
     return result
 
 
-def convert_to_bmp_in_memory(image_path):
-    """在内存中将任意格式图片转换为BMP格式的临时文件用于Excel显示"""
-    if not PIL_AVAILABLE:
-        return image_path  # 如果PIL不可用，返回原路径
+# Excel中图片的最大显示尺寸（像素）
+IMAGE_DISPLAY_SIZE = 100
+
+
+def make_thumbnail(image_path, max_size=IMAGE_DISPLAY_SIZE, quality=85):
+    """生成按比例缩小到显示尺寸的JPEG缩略图，返回 (图片数据, 宽度, 高度)
+
+    JPEG图片利用 draft 在解码时直接按比例缩小，其余格式在缩放时使用 reduce 加速；
+    透明背景统一铺白。缩略图只保存在内存中，不写临时文件。
+    """
+    from PIL import Image
+
+    with Image.open(image_path) as img:
+        # JPEG在解码阶段直接缩小，避免解码完整分辨率
+        img.draft('RGB', (max_size, max_size))
         
-    try:
-        import tempfile
+        # 转换为RGB模式（JPEG不支持透明通道）
+        if img.mode in ('RGBA', 'LA', 'P'):
+            if img.mode == 'P':
+                img = img.convert('RGBA')
+            background = Image.new('RGB', img.size, (255, 255, 255))
+            background.paste(img, mask=img.split()[-1])
+            img = background
+        else:
+            img = img.convert('RGB')
         
-        with Image.open(image_path) as img:
-            # 转换为RGB模式（BMP不支持透明通道）
-            if img.mode in ('RGBA', 'LA', 'P'):
-                background = Image.new('RGB', img.size, (255, 255, 255))
-                if img.mode == 'P':
-                    img = img.convert('RGBA')
-                if img.mode == 'RGBA':
-                    background.paste(img, mask=img.split()[-1])
-                else:
-                    background.paste(img)
-                img = background
-            else:
-                img = img.convert('RGB')
-            
-            # 创建临时BMP文件
-            temp_file = tempfile.NamedTemporaryFile(suffix='.bmp', delete=False)
-            temp_path = temp_file.name
-            temp_file.close()
-            
-            # 保存为BMP格式到临时文件
-            img.save(temp_path, 'BMP')
-            
-            return temp_path
-    except Exception as e:
-        print(f"图片内存转换BMP失败 {image_path}: {e}")
-        return image_path  # 转换失败，返回原路径
+        # 只缩小不放大，保持比例
+        img.thumbnail((max_size, max_size), Image.LANCZOS, reducing_gap=2.0)
+        
+        buffer = io.BytesIO()
+        img.save(buffer, 'JPEG', quality=quality)
+        return buffer.getvalue(), img.width, img.height
 
 
-def download_single_image(url, output_dir="images", timeout=30, max_retries=3):
-    """下载单个图片（保持原图），支持重试"""
-    # 验证URL
-    if not url or pd.isna(url) or not str(url).startswith(('http://', 'https://')):
-        return None, url
-    
-    # 创建图片目录
-    os.makedirs(output_dir, exist_ok=True)
-    
-    # 生成文件名（使用URL的hash值避免重复和特殊字符）
-    url_hash = hashlib.md5(str(url).encode()).hexdigest()
-    
-    # 尝试从URL获取文件扩展名
-    parsed_url = urlparse(str(url))
-    path = parsed_url.path.lower()
+def _guess_image_ext(url):
+    """尝试从URL获取图片文件扩展名，默认使用 .jpg"""
+    path = urlparse(str(url)).path.lower()
     if path.endswith(('.jpg', '.jpeg')):
-        ext = '.jpg'
+        return '.jpg'
     elif path.endswith('.png'):
-        ext = '.png'
+        return '.png'
     elif path.endswith('.gif'):
-        ext = '.gif'
+        return '.gif'
     elif path.endswith('.webp'):
-        ext = '.webp'
-    else:
-        ext = '.jpg'  # 默认使用jpg
-    
-    filename = f"{url_hash}{ext}"
-    filepath = os.path.join(output_dir, filename)
-    
-    # 如果文件已存在，直接返回
-    if os.path.exists(filepath):
-        return filepath, url
-    
-    # 重试下载
-    last_error = None
-    for attempt in range(max_retries):
+        return '.webp'
+    return '.jpg'
+
+
+class ImageCache:
+    """按内容寻址的图片下载缓存
+
+    图片以内容的SHA-256哈希命名保存在缓存目录中，sqlite索引记录每个URL对应的
+    ETag/Last-Modified、文件大小、内容哈希和最后访问时间。命中判断查索引，不再遍历缓存目录；
+    索引中的文件已被删除时丢弃该条目，按未命中处理并重新下载。
+    下载内容先写入临时文件，完整写完后再原子重命名，中断的下载不会被当作缓存命中；
+    被强制结束的下载留下的临时文件在下次打开缓存时清理。URL的内容更新后，不再被引用的旧文件随即删除。
+    设置 max_bytes 后按最近最少使用（LRU）淘汰，使缓存目录保持在固定的磁盘预算内。
+    revalidate 为 True 时，命中的条目会携带 ETag/Last-Modified 向服务器确认是否仍然有效。
+    """
+
+    INDEX_NAME = 'index.sqlite3'
+    TEMP_SUFFIX = '.part'
+    # 超过这个时间（秒）仍未完成的临时文件视为中断的下载（其他进程可能正在写入较新的临时文件）
+    STALE_TEMP_SECONDS = 3600
+
+    def __init__(self, cache_dir='images', max_bytes=None, revalidate=False):
+        os.makedirs(cache_dir, exist_ok=True)
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.revalidate = revalidate
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(os.path.join(cache_dir, self.INDEX_NAME),
+                                     timeout=30, check_same_thread=False)
+        with self._lock, self._conn:
+            self._conn.execute("""
+                CREATE TABLE IF NOT EXISTS images (
+                    url TEXT PRIMARY KEY,
+                    content_hash TEXT NOT NULL,
+                    filename TEXT NOT NULL,
+                    size INTEGER NOT NULL,
+                    etag TEXT,
+                    last_modified TEXT,
+                    created_at REAL NOT NULL,
+                    last_access REAL NOT NULL
+                )
+            """)
+            self._conn.execute(
+                "CREATE INDEX IF NOT EXISTS idx_images_last_access ON images (last_access)")
+        self._remove_stale_temp_files()
+
+    def _remove_stale_temp_files(self):
+        """删除中断的下载留下的临时文件"""
+        cutoff = time.time() - self.STALE_TEMP_SECONDS
+        for entry in os.scandir(self.cache_dir):
+            if not entry.name.endswith(self.TEMP_SUFFIX):
+                continue
+            try:
+                if entry.stat().st_mtime < cutoff:
+                    os.remove(entry.path)
+            except OSError:
+                pass
+
+    def path_for(self, entry):
+        """返回缓存条目对应的本地文件路径"""
+        return os.path.join(self.cache_dir, entry['filename'])
+
+    def lookup(self, url):
+        """查询URL的缓存条目，命中时更新最后访问时间；未命中或文件已不存在时返回None"""
+        with self._lock, self._conn:
+            row = self._conn.execute(
+                "SELECT url, content_hash, filename, size, etag, last_modified FROM images WHERE url = ?",
+                (url,)).fetchone()
+            if row is not None and not os.path.exists(os.path.join(self.cache_dir, row[2])):
+                # 文件已被删除（其他进程淘汰或手动删除），丢弃引用它的条目
+                self._conn.execute("DELETE FROM images WHERE filename = ?", (row[2],))
+                row = None
+            if row is None:
+                self.misses += 1
+                return None
+            self._conn.execute("UPDATE images SET last_access = ? WHERE url = ?", (time.time(), url))
+            self.hits += 1
+        keys = ('url', 'content_hash', 'filename', 'size', 'etag', 'last_modified')
+        return dict(zip(keys, row))
+
+    def touch(self, url):
+        """更新URL的最后访问时间"""
+        with self._lock, self._conn:
+            self._conn.execute("UPDATE images SET last_access = ? WHERE url = ?", (time.time(), url))
+
+    def store(self, url, chunks, ext='.jpg', etag=None, last_modified=None):
+        """将下载内容写入缓存并登记索引，返回缓存文件路径
+
+        内容先写入临时文件并同时计算哈希，写完后原子重命名为 <哈希><扩展名>。
+        """
+        temp_path = os.path.join(self.cache_dir, f"{uuid.uuid4().hex}{self.TEMP_SUFFIX}")
+        digest = hashlib.sha256()
+        size = 0
         try:
-            # 下载图片
-            headers = {
-                'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'
-            }
-            response = requests.get(str(url), headers=headers, timeout=timeout, stream=True)
-            response.raise_for_status()
-            
-            # 保存图片
-            with open(filepath, 'wb') as f:
-                for chunk in response.iter_content(chunk_size=8192):
+            with open(temp_path, 'wb') as f:
+                for chunk in chunks:
+                    if not chunk:
+                        continue
                     f.write(chunk)
-            
-            # 验证文件是否成功保存
-            if os.path.exists(filepath):
-                return filepath, url
-            else:
-                raise Exception("文件保存后不存在")
-                
-        except Exception as e:
-            last_error = e
-            if attempt < max_retries - 1:  # 如果不是最后一次尝试
-                print(f"下载失败，第{attempt + 1}次重试: {url}")
-                time.sleep(1)  # 等待1秒后重试
-            continue
-    
-    print(f"下载最终失败 (重试{max_retries}次): {url}, 错误: {last_error}")
-    return None, url
+                    digest.update(chunk)
+                    size += len(chunk)
+            if size == 0:
+                raise ValueError("下载内容为空")
+            content_hash = digest.hexdigest()
+            filename = f"{content_hash}{ext}"
+            filepath = os.path.join(self.cache_dir, filename)
+            os.replace(temp_path, filepath)
+        except BaseException:
+            try:
+                os.remove(temp_path)
+            except OSError:
+                pass
+            raise
 
+        now = time.time()
+        with self._lock, self._conn:
+            old = self._conn.execute("SELECT filename FROM images WHERE url = ?", (url,)).fetchone()
+            self._conn.execute(
+                "INSERT OR REPLACE INTO images "
+                "(url, content_hash, filename, size, etag, last_modified, created_at, last_access) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (url, content_hash, filename, size, etag, last_modified, now, now))
+            # URL的内容已更新：旧文件不再被任何URL引用时删除，否则它不在索引中，也不会被淘汰
+            if old is not None and old[0] != filename and self._conn.execute(
+                    "SELECT 1 FROM images WHERE filename = ? LIMIT 1", (old[0],)).fetchone() is None:
+                try:
+                    os.remove(os.path.join(self.cache_dir, old[0]))
+                except FileNotFoundError:
+                    pass
+        return filepath
 
-def download_images_parallel(urls, max_workers=5, output_dir="images"):
-    """并行下载多个图片"""
-    results = {}
-    failed_urls = []
-    
-    print(f"\n开始并行下载 {len(urls)} 张图片（最多 {max_workers} 个线程）...")
+    def total_bytes(self):
+        """缓存文件占用的总字节数（内容相同的文件只计算一次）"""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT COALESCE(SUM(size), 0) FROM "
+                "(SELECT filename, MAX(size) AS size FROM images GROUP BY filename)").fetchone()
+        return row[0]
+
+    def evict(self, max_bytes=None, keep_since=None):
+        """按最近最少使用淘汰缓存，直到总大小不超过 max_bytes
+
+        last_access 不早于 keep_since 的条目（例如本次运行用到的图片）不会被淘汰。
+        返回 (淘汰的文件数, 释放的字节数)。
+        """
+        if max_bytes is None:
+            max_bytes = self.max_bytes
+        if max_bytes is None:
+            return 0, 0
+
+        total = self.total_bytes()
+        removed_files = 0
+        freed_bytes = 0
+        if total <= max_bytes:
+            return removed_files, freed_bytes
+
+        with self._lock, self._conn:
+            # 同一个文件可能被多个URL引用，以其中最近的访问时间作为该文件的访问时间
+            candidates = self._conn.execute(
+                "SELECT filename, MAX(size), MAX(last_access) AS accessed FROM images "
+                "GROUP BY filename ORDER BY accessed").fetchall()
+            for filename, size, accessed in candidates:
+                if total <= max_bytes:
+                    break
+                if keep_since is not None and accessed >= keep_since:
+                    break
+                self._conn.execute("DELETE FROM images WHERE filename = ?", (filename,))
+                try:
+                    os.remove(os.path.join(self.cache_dir, filename))
+                except FileNotFoundError:
+                    pass
+                total -= size
+                removed_files += 1
+                freed_bytes += size
+        return removed_files, freed_bytes
+
+    def stats(self):
+        """返回缓存统计信息"""
+        with self._lock:
+            entries, oldest, newest = self._conn.execute(
+                "SELECT COUNT(*), MIN(last_access), MAX(last_access) FROM images").fetchone()
+            files = self._conn.execute("SELECT COUNT(DISTINCT filename) FROM images").fetchone()[0]
+        lookups = self.hits + self.misses
+        return {
+            'cache_dir': self.cache_dir,
+            'entries': entries,
+            'files': files,
+            'total_bytes': self.total_bytes(),
+            'max_bytes': self.max_bytes,
+            'oldest_access': oldest,
+            'newest_access': newest,
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': self.hits / lookups if lookups else None,
+        }
+
+    def close(self):
+        """关闭索引数据库连接"""
+        with self._lock:
+            self._conn.close()
+
+
+def print_cache_stats(cache):
+    """打印图片缓存统计信息"""
+    stats = cache.stats()
+
+    def format_time(timestamp):
+        return time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(timestamp)) if timestamp else '-'
+
+    print("\n图片缓存统计:")
+    print("=" * 60)
+    print(f"缓存目录: {stats['cache_dir']}")
+    print(f"URL条目数: {stats['entries']}")
+    print(f"图片文件数: {stats['files']}")
+    print(f"占用空间: {stats['total_bytes'] / 1024 / 1024:.2f} MB")
+    if stats['max_bytes'] is not None:
+        print(f"空间预算: {stats['max_bytes'] / 1024 / 1024:.2f} MB")
+    print(f"最早访问: {format_time(stats['oldest_access'])}")
+    print(f"最近访问: {format_time(stats['newest_access'])}")
+    print("=" * 60)
+
+
+class ImageDownloader:
+    """带连接池的并行图片下载器
+
+    工作线程池在多次下载之间复用，每个线程持有自己的 requests.Session，
+    同一主机的连接通过 HTTP keep-alive 复用；同一主机的并发请求数受 per_host_limit 限制。
+    失败后按指数退避加随机抖动重试，下载结果写入 ImageCache。
+    """
+
+    USER_AGENT = 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'
+
+    # 这些状态码重试也不会成功，直接放弃
+    NO_RETRY_STATUS = {400, 401, 403, 404, 410}
+
+    def __init__(self, cache, max_workers=8, per_host_limit=4, timeout=30, max_retries=3,
+                 backoff_base=0.5, backoff_max=10):
+        self.cache = cache
+        self.max_workers = max_workers
+        self.per_host_limit = per_host_limit
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._sessions = []
+        self._host_limits = {}
+        self._executor = None
+
+    def _session(self):
+        """返回当前线程的 Session，首次调用时创建"""
+        session = getattr(self._local, 'session', None)
+        if session is None:
+            import requests
+            from requests.adapters import HTTPAdapter
+
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=16,
+                                  pool_maxsize=self.per_host_limit or self.max_workers)
+            session.mount('http://', adapter)
+            session.mount('https://', adapter)
+            session.headers['User-Agent'] = self.USER_AGENT
+            self._local.session = session
+            with self._lock:
+                self._sessions.append(session)
+        return session
+
+    def _host_semaphore(self, url):
+        """返回限制该主机并发数的信号量，未设置限制时返回None"""
+        if not self.per_host_limit:
+            return None
+        host = urlparse(url).netloc.lower()
+        with self._lock:
+            semaphore = self._host_limits.get(host)
+            if semaphore is None:
+                semaphore = threading.BoundedSemaphore(self.per_host_limit)
+                self._host_limits[host] = semaphore
+        return semaphore
+
+    def _backoff_delay(self, attempt):
+        """第 attempt 次失败后的等待时间：指数增长，上限 backoff_max，并加入完全随机抖动"""
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * (2 ** attempt)))
+
+    def _fetch(self, url, entry):
+        """发起一次请求并写入缓存，返回本地文件路径"""
+        headers = {}
+        if entry:
+            if entry['etag']:
+                headers['If-None-Match'] = entry['etag']
+            if entry['last_modified']:
+                headers['If-Modified-Since'] = entry['last_modified']
+
+        semaphore = self._host_semaphore(url)
+        if semaphore:
+            semaphore.acquire()
+        try:
+            with self._session().get(url, headers=headers, timeout=self.timeout, stream=True) as response:
+                # 服务器确认缓存仍然有效
+                if entry and response.status_code == 304:
+                    self.cache.touch(url)
+                    return self.cache.path_for(entry)
+
+                response.raise_for_status()
+
+                # 保存图片（先写临时文件，完成后原子重命名）
+                filepath = self.cache.store(url, response.iter_content(chunk_size=65536),
+                                            _guess_image_ext(url),
+                                            etag=response.headers.get('ETag'),
+                                            last_modified=response.headers.get('Last-Modified'))
+                profile_add('download', bytes=os.path.getsize(filepath))
+                return filepath
+        finally:
+            if semaphore:
+                semaphore.release()
+
+    def download(self, url):
+        """下载单个图片（保持原图），支持重试，返回本地文件路径，失败返回None
+
+        已缓存的URL直接返回本地文件，不访问网络，除非缓存开启了 revalidate。
+        """
+        import pandas as pd
+
+        # 验证URL
+        if not url or pd.isna(url) or not str(url).startswith(('http://', 'https://')):
+            return None
+        url = str(url)
+
+        # 查询缓存
+        entry = self.cache.lookup(url)
+        if entry and not self.cache.revalidate:
+            return self.cache.path_for(entry)
+
+        # 重试下载
+        last_error = None
+        for attempt in range(self.max_retries):
+            try:
+                return self._fetch(url, entry)
+            except Exception as e:
+                last_error = e
+                status = getattr(getattr(e, 'response', None), 'status_code', None)
+                if status in self.NO_RETRY_STATUS:
+                    break
+                if attempt < self.max_retries - 1:  # 如果不是最后一次尝试
+                    print(f"下载失败，第{attempt + 1}次重试: {url}")
+                    time.sleep(self._backoff_delay(attempt))
+
+        print(f"下载最终失败: {url}, 错误: {last_error}")
+        return None
+
+    def submit(self, url):
+        """提交一个下载任务，返回结果为本地文件路径（失败为None）的 Future"""
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=self.max_workers)
+        return self._executor.submit(self.download, url)
+
+    def describe(self, count):
+        """打印开始下载的提示信息"""
+        print(f"\n开始并行下载 {count} 张图片（最多 {self.max_workers} 个线程，"
+              f"每个主机最多 {self.per_host_limit or self.max_workers} 个连接）...")
+
+    def finish_run(self, succeeded, failed_urls, hits_before, run_started):
+        """打印一轮下载的统计，并在超出磁盘预算时淘汰旧图片（本轮用到的图片保留）"""
+        print(f"\n下载完成！成功: {succeeded}, 失败: {len(failed_urls)}, 缓存命中: {self.cache.hits - hits_before}")
+        profile_add('download', seconds=time.time() - run_started, calls=1,
+                    items=succeeded + len(failed_urls), failed=len(failed_urls),
+                    cache_hits=self.cache.hits - hits_before)
+
+        if failed_urls:
+            print("失败的URL示例:", failed_urls[:3])
+
+        removed_files, freed_bytes = self.cache.evict(keep_since=run_started)
+        if removed_files:
+            print(f"缓存淘汰: 删除 {removed_files} 个文件，释放 {freed_bytes / 1024 / 1024:.2f} MB")
+
+    def download_all(self, urls):
+        """并行下载多个图片，返回 URL -> 本地文件路径 的字典"""
+        import pandas as pd
+
+        results = {}
+        failed_urls = []
+        run_started = time.time()
+        hits_before = self.cache.hits
+
+        self.describe(len(urls))
+
+        # 提交所有下载任务
+        future_to_url = {
+            self.submit(url): url
+            for url in urls if pd.notna(url) and str(url).strip()
+        }
+
+        completed = 0
+        total = len(future_to_url)
+
+        # 处理完成的任务
+        for future in as_completed(future_to_url):
+            url = future_to_url[future]
+            try:
+                filepath = future.result()
+                if filepath:
+                    results[url] = filepath
+                else:
+                    failed_urls.append(url)
+            except Exception as e:
+                print(f"下载异常 {url}: {e}")
+                failed_urls.append(url)
+
+            completed += 1
+            print(f"下载进度: {completed}/{total} (成功: {len(results)}, 失败: {len(failed_urls)})", end='\r')
+
+        self.finish_run(len(results), failed_urls, hits_before, run_started)
+        return results
+
+    def close(self):
+        """关闭线程池和所有连接"""
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+            self._executor = None
+        with self._lock:
+            for session in self._sessions:
+                session.close()
+            self._sessions = []
+
+
+def download_single_image(url, output_dir="images", timeout=30, max_retries=3, cache=None):
+    """下载单个图片（保持原图），支持重试，返回 (本地文件路径, url)
+
+    下载结果保存在 ImageCache 中（默认使用 output_dir 目录）。
+    """
+    own_cache = cache is None
+    if own_cache:
+        cache = ImageCache(output_dir)
+    downloader = ImageDownloader(cache, max_workers=1, timeout=timeout, max_retries=max_retries)
+    try:
+        return downloader.download(url), url
+    finally:
+        downloader.close()
+        if own_cache:
+            cache.close()
+
+
+def download_images_parallel(urls, max_workers=5, output_dir="images", cache=None):
+    """并行下载多个图片，返回 URL -> 本地文件路径 的字典"""
+    own_cache = cache is None
+    if own_cache:
+        cache = ImageCache(output_dir)
+    downloader = ImageDownloader(cache, max_workers=max_workers)
+    try:
+        return downloader.download_all(urls)
+    finally:
+        downloader.close()
+        if own_cache:
+            cache.close()
+
+
+def build_image_url_index(image_values):
+    """为图片列建立 URL -> 行位置 的索引，并打印URL统计
+
+    使用 factorize 一次完成去重和编码，不逐行构造 Series。返回 (image_urls, row_codes, rows_by_code)：
+    image_urls 为按首次出现顺序去重后的有效URL；row_codes 为每行对应URL在 image_urls 中的序号
+    （空URL为 -1）；rows_by_code[i] 为引用 image_urls[i] 的所有行位置（从0开始）。
+    """
+    import numpy as np
+    import pandas as pd
+
+    values = pd.Series(image_values).reset_index(drop=True)
+    as_str = values.astype(str)
+    valid = values.notna() & (as_str.str.strip() != '')
+    
+    codes, uniques = pd.factorize(as_str.where(valid), sort=False)
+    image_urls = list(uniques)
+    
+    # 按URL序号稳定排序后切分，得到每个URL的行位置
+    valid_positions = np.flatnonzero(codes >= 0)
+    order = np.argsort(codes[valid_positions], kind='stable')
+    counts = np.bincount(codes[valid_positions], minlength=len(image_urls))
+    rows_by_code = np.split(valid_positions[order], np.cumsum(counts)[:-1]) if image_urls else []
+    
+    empty_urls = len(values) - len(valid_positions)
+    print(f"URL统计: 总行数={len(values)}, 有效URL={len(image_urls)}, 空URL={empty_urls}, 重复URL={len(valid_positions)-len(image_urls)}")
+    return image_urls, codes, rows_by_code
+
+
+def _prepare_excel_image(image_path, max_display_size=IMAGE_DISPLAY_SIZE):
+    """解码图片并生成显示尺寸的缩略图
+
+    返回 (缩略图数据, 显示宽度, 显示高度)，失败时返回None。
+    """
+    if not _pil_available():
+        print(f"未安装Pillow，无法处理图片: {image_path}")
+        return None
+    
+    # 确保文件存在
+    if not os.path.exists(image_path):
+        print(f"文件不存在，跳过: {image_path}")
+        return None
+    
+    try:
+        return make_thumbnail(image_path, max_display_size)
+    except Exception as e:
+        print(f"生成缩略图失败 {image_path}: {e}")
+        return None
+
+
+def _create_excel_image(prepared):
+    """根据缩略图创建一个可插入工作表的图片对象
+
+    同一URL的所有行共享同一份缩略图数据，每个图片对象只包装一个独立的 BytesIO
+    （openpyxl 保存时会关闭读取过的文件对象）。
+    """
+    from openpyxl.drawing.image import Image as XLImage
+
+    data, width, height = prepared
+    img = XLImage(io.BytesIO(data))
+    img.width = width
+    img.height = height
+    return img
+
+
+def create_image_executor(image_workers=None):
+    """创建图片解码缩放使用的执行器
+
+    image_workers 为进程数，默认等于CPU核心数；为1时在主进程的单个线程中处理，省去启动子进程的开销。
+    子进程统一使用 spawn 方式启动，避免在下载线程运行时 fork 带来的死锁风险。
+    """
+    if image_workers is None:
+        image_workers = os.cpu_count() or 1
+    if image_workers <= 1:
+        return ThreadPoolExecutor(max_workers=1)
+    return ProcessPoolExecutor(max_workers=image_workers,
+                               mp_context=multiprocessing.get_context('spawn'))
+
+
+def _executor_usable(executor):
+    """执行器是否还能接受任务；损坏的进程池和已关闭的执行器在 submit 时立即抛出异常"""
+    try:
+        executor.submit(int)
+    except (BrokenExecutor, RuntimeError):
+        return False
+    return True
+
+
+class ImagePipeline:
+    """图片处理流水线：下载 -> 生成缩略图 -> 插入
+
+    每张图片下载完成后立即交给转换进程池生成缩略图（每个URL只解码一次），
+    解码、铺白和缩放在多个CPU核心上并行，子进程只把编码后的缩略图数据传回主进程；插入阶段可以按完成顺序
+    （as_completed）或按指定URL（result）取用结果。网络下载、图片转换和工作表写入同时进行，
+    总耗时接近 max(下载, 写入) 而不是两者之和。
+    image_workers 也可以是已创建的执行器（服务模式中多次导出共用），此时由调用方负责关闭。
+    """
+
+    def __init__(self, downloader, image_workers=None):
+        self.downloader = downloader
+        self._own_executor = not isinstance(image_workers, Executor)
+        self._convert_executor = (create_image_executor(image_workers) if self._own_executor
+                                  else image_workers)
+        self._lock = threading.Lock()
+        self._futures = {}
+        self._failed_urls = []
+        self._succeeded = 0
+        self._run_started = None
+        self._hits_before = 0
+        self._converted = 0
+        self._convert_first = None
+        self._convert_last = None
+
+    def start(self, urls):
+        """提交所有图片的下载任务，立即返回"""
+        self._run_started = time.time()
+        self._hits_before = self.downloader.cache.hits
+        self.downloader.describe(len(urls))
+        for url in urls:
+            self._futures[url] = self._chain(url, self.downloader.submit(url))
+        return self
+
+    def _chain(self, url, download_future):
+        """下载完成后把图片交给转换线程池，返回最终结果的 Future"""
+        result = Future()
+
+        def on_converted(future):
+            try:
+                prepared = future.result()
+            except Exception as e:
+                print(f"图片转换失败 {url}: {e}")
+                prepared = None
+            with self._lock:
+                self._converted += 1
+                self._convert_last = time.perf_counter()
+                if prepared is None:
+                    self._failed_urls.append(url)
+                else:
+                    self._succeeded += 1
+            result.set_result(prepared)
+
+        def on_downloaded(future):
+            try:
+                filepath = future.result()
+            except Exception as e:
+                print(f"下载异常 {url}: {e}")
+                filepath = None
+            if not filepath:
+                with self._lock:
+                    self._failed_urls.append(url)
+                result.set_result(None)
+                return
+            with self._lock:
+                if self._convert_first is None:
+                    self._convert_first = time.perf_counter()
+            try:
+                convert_future = self._convert_executor.submit(_prepare_excel_image, filepath)
+            except Exception as e:
+                # 进程池已损坏或已关闭；回调中抛出的异常不会传给等待结果的一方，必须在这里结束该URL
+                print(f"图片转换失败 {url}: {e}")
+                with self._lock:
+                    self._failed_urls.append(url)
+                result.set_result(None)
+                return
+            convert_future.add_done_callback(on_converted)
+
+        download_future.add_done_callback(on_downloaded)
+        return result
+
+    @property
+    def cache_dir(self):
+        """图片缓存目录"""
+        return self.downloader.cache.cache_dir
+
+    def result(self, url):
+        """等待并返回指定URL的处理结果，失败或不在流水线中时返回None"""
+        future = self._futures.get(url)
+        return future.result() if future is not None else None
+
+    def as_completed(self, urls=None):
+        """按完成顺序产出 (url, 处理结果)；urls 指定时只产出这些URL的结果"""
+        if urls is None:
+            urls = self._futures
+        future_to_url = {self._futures[url]: url for url in urls if url in self._futures}
+        for future in as_completed(future_to_url):
+            yield future_to_url[future], future.result()
+
+    def finish(self):
+        """等待所有任务结束，打印统计并关闭转换线程池"""
+        for future in self._futures.values():
+            future.result()
+        if self._own_executor:
+            self._convert_executor.shutdown(wait=True)
+        if self._converted:
+            # 转换与下载、写入并行进行，这里记录从第一张开始转换到最后一张转换完成的时间
+            profile_add('convert_images', seconds=self._convert_last - self._convert_first, calls=1,
+                        items=self._converted)
+        self.downloader.finish_run(self._succeeded, self._failed_urls,
+                                   self._hits_before, self._run_started)
+
+
+class PreparedImages:
+    """已经生成好的缩略图，接口与 ImagePipeline 相同（result / as_completed / finish）
+
+    多组列导出时由主进程统一下载图片并生成缩略图，工作进程直接插入，不再下载和解码。
+    images 为 URL -> 缩略图（失败为None）的字典。
+    """
+
+    def __init__(self, images, cache_dir=None):
+        self.images = images
+        self.cache_dir = cache_dir
+
+    def result(self, url):
+        """返回指定URL的缩略图，失败或没有该URL时返回None"""
+        return self.images.get(url)
+
+    def as_completed(self, urls=None):
+        """产出 (url, 缩略图)；urls 指定时只产出这些URL"""
+        for url in self.images if urls is None else urls:
+            if url in self.images:
+                yield url, self.images[url]
+
+    def finish(self):
+        """缩略图已经生成，没有需要等待的任务"""
+
+
+def _write_excel_openpyxl(sheets, output_file, id_columns, pipeline=None):
+    """使用 pd.ExcelWriter 写出工作表，写完后再逐个单元格设置格式并插入图片
+
+    sheets 为 [(工作表名, DataFrame, 图片列, 图片URL索引)]，没有图片时后两项为None。
+    图片在写工作表之前就已经由 pipeline 开始下载和转换，写完每个工作表后按下载完成的顺序插入。
+    """
+    import pandas as pd
+
+    # 保存工作簿阶段的耗时不包括嵌套在其中的写入、格式设置和插入图片阶段
+    with profile_stage('save_workbook'), pd.ExcelWriter(output_file, engine='openpyxl') as writer:
+        for sheet_name, result_df, image_column, url_index in sheets:
+            with profile_stage('write_sheet') as stats:
+                result_df.to_excel(writer, index=False, sheet_name=sheet_name)
+                stats['rows'] = len(result_df)
+            
+            # 获取工作表
+            worksheet = writer.sheets[sheet_name]
+            
+            # 找到ID列的位置并设置为文本格式
+            with profile_stage('format_cells') as stats:
+                for col_idx, col_name in enumerate(result_df.columns, 1):
+                    if col_name in id_columns:
+                        for row_idx in range(2, len(result_df) + 2):
+                            cell = worksheet.cell(row=row_idx, column=col_idx)
+                            cell.number_format = '@'  # 文本格式
+                stats['rows'] = len(result_df)
+            
+            # 如果需要下载图片且找到了图片列
+            if pipeline and image_column and url_index[0]:
+                image_urls, _, rows_by_code = url_index
+                
+                # 找到图片列的位置（现在应该在第一列）
+                image_col_idx = list(result_df.columns).index(image_column) + 1
+                
+                # 设置图片列宽
+                col_letter = worksheet.cell(row=1, column=image_col_idx).column_letter
+                worksheet.column_dimensions[col_letter].width = 15
+                
+                code_by_url = {url: code for code, url in enumerate(image_urls)}
+                inserted_count = 0
+                
+                # 每张图片处理完成后立即插入到引用它的所有行
+                with profile_stage('insert_images') as stats:
+                    for image_url, prepared in pipeline.as_completed(image_urls):
+                        if prepared is None:
+                            continue
+                        for row_idx in (rows_by_code[code_by_url[image_url]] + 2).tolist():
+                            try:
+                                img = _create_excel_image(prepared)
+                                
+                                # 设置图片位置
+                                cell_ref = worksheet.cell(row=row_idx, column=image_col_idx).coordinate
+                                img.anchor = cell_ref
+                                
+                                worksheet.add_image(img)
+                                
+                                # 清空单元格中的URL文字，只保留图片
+                                cell = worksheet.cell(row=row_idx, column=image_col_idx)
+                                cell.value = ""
+                                
+                                # 设置行高以适应图片
+                                worksheet.row_dimensions[row_idx].height = 80
+                                
+                                inserted_count += 1
+                                
+                            except Exception as e:
+                                print(f"插入图片失败 {image_url}: {e}")
+                    stats['items'] = inserted_count
+                
+                print(f"成功插入 {inserted_count} 张图片到Excel")
+
+
+def _write_excel_fast(sheets, output_file, id_columns, pipeline=None, chunksize=10000):
+    """使用openpyxl只写模式流式写出工作表
+
+    sheets 的格式与 _write_excel_openpyxl 相同。
+    行在写入时直接带上列级别的文本格式，写完即刷到磁盘，不保留整个工作簿的对象图；
+    图片在写行之前就已经由 pipeline 开始下载和转换；写到某一行时只等待该行的图片，
+    其余图片继续在后台下载（只写模式下行高必须在写入该行之前设置）。
+    """
+    from openpyxl import Workbook
+
+    workbook = Workbook(write_only=True)
+    for sheet_name, result_df, image_column, url_index in sheets:
+        image_col_idx = list(result_df.columns).index(image_column) + 1 if image_column else None
+        image_urls, row_codes, _ = url_index if image_column else (None, None, None)
+        _write_rows_fast(workbook, sheet_name, result_df, id_columns, image_col_idx,
+                         pipeline if image_urls else None, image_urls, row_codes, chunksize)
+    
+    with profile_stage('save_workbook'):
+        workbook.save(output_file)
+
+
+def _write_rows_fast(workbook, sheet_name, result_df, id_columns, image_col_idx, pipeline,
+                     image_urls, row_codes, chunksize):
+    """_write_excel_fast 的写行部分：在只写模式的工作簿中创建一个工作表并写入所有行"""
+    from openpyxl.cell import WriteOnlyCell
+    from openpyxl.utils import get_column_letter
+    
+    columns = list(result_df.columns)
+    worksheet = workbook.create_sheet(sheet_name)
+    text_positions = [i for i, name in enumerate(columns) if name in id_columns]
+    
+    if image_col_idx:
+        # 设置图片列宽（只写模式下必须在写入任何行之前设置）
+        worksheet.column_dimensions[get_column_letter(image_col_idx)].width = 15
+    
+    worksheet.append(columns)
+    
+    inserted_count = 0
+    row_idx = 2
+    with profile_stage('write_sheet') as write_stats:
+        for start in range(0, len(result_df), chunksize):
+            chunk = result_df.iloc[start:start + chunksize].astype(object)
+            chunk = chunk.where(chunk.notna(), None)
+            for values in chunk.itertuples(index=False, name=None):
+                values = list(values)
+                
+                # ID列写为文本格式的单元格
+                for pos in text_positions:
+                    cell = WriteOnlyCell(worksheet, value=values[pos])
+                    cell.number_format = '@'
+                    values[pos] = cell
+                
+                code = row_codes[row_idx - 2] if pipeline else -1
+                if code >= 0:
+                    image_url = image_urls[code]
+                    # 只等待本行的图片，其余图片继续在后台处理
+                    with profile_stage('wait_images'):
+                        prepared = pipeline.result(image_url)
+                    if prepared:
+                        try:
+                            img = _create_excel_image(prepared)
+                            img.anchor = f"{get_column_letter(image_col_idx)}{row_idx}"
+                            worksheet.add_image(img)
+                            # 清空单元格中的URL文字，只保留图片，并设置行高以适应图片
+                            values[image_col_idx - 1] = None
+                            worksheet.row_dimensions[row_idx].height = 80
+                            inserted_count += 1
+                        except Exception as e:
+                            print(f"插入图片失败 {image_url}: {e}")
+                
+                worksheet.append(values)
+                row_idx += 1
+        write_stats.update(rows=row_idx - 2, items=inserted_count)
+    
+    if pipeline:
+        print(f"成功插入 {inserted_count} 张图片到Excel")
+
+
+EXPORT_ENGINES = {
+    'openpyxl': _write_excel_openpyxl,
+    'fast': _write_excel_fast,
+}
+
+
+def _select_export_columns(df, selected_columns, download_images=False):
+    """取出要导出的列，返回 (DataFrame, 图片列)；需要下载图片时图片列移到第一列，否则图片列为None"""
+    # 检查是否有商品图片列且需要下载图片
+    image_column = None
+    if download_images:
+        if IMAGE_COLUMN in selected_columns:
+            image_column = IMAGE_COLUMN
+    
+    # 如果有图片列且要下载图片，调整列顺序，将图片列放在第一列
+    if download_images and image_column:
+        # 将图片列移到第一列
+        reordered_columns = [image_column]
+        for col in selected_columns:
+            if col != image_column:
+                reordered_columns.append(col)
+        selected_columns = reordered_columns
+    
+    with profile_stage('select_columns') as stats:
+        result_df = df[list(selected_columns)].copy()
+        stats['rows'] = len(result_df)
+    return result_df, image_column
+
+
+def export_columns(df, selected_columns, output_file, download_images=False, id_columns=None,
+                   engine='openpyxl', image_downloader=None, image_workers=None, image_pipeline=None):
+    """导出指定列到Excel文件
+
+    engine 为 'openpyxl' 时使用 pd.ExcelWriter；为 'fast' 时使用只写模式流式写出，内存占用有界。
+    image_downloader 为下载图片使用的 ImageDownloader，默认使用 images/ 目录作为缓存；
+    image_workers 为解码缩放图片的进程数，默认等于CPU核心数，也可以传入共用的执行器。
+    image_pipeline 为多次导出共用的、已经启动的 ImagePipeline，由调用方负责 finish。
+    """
+    return export_sheets(df, [('Sheet1', selected_columns)], output_file, download_images,
+                         id_columns=id_columns, engine=engine, image_downloader=image_downloader,
+                         image_workers=image_workers, image_pipeline=image_pipeline)
+
+
+def export_sheets(df, sheets, output_file, download_images=False, id_columns=None,
+                  engine='openpyxl', image_downloader=None, image_workers=None, image_pipeline=None):
+    """把多组列分别导出到同一个Excel文件的不同工作表，sheets 为 [(工作表名, 选中的列)]
+
+    所有工作表的图片共用一次下载和缩略图转换；其余参数与 export_columns 相同。
+    """
+    try:
+        if not sheets or not all(selected for _, selected in sheets):
+            print("错误: 没有有效的列可以导出")
+            return False
+        
+        if engine not in EXPORT_ENGINES:
+            print(f"错误: 不支持的导出引擎 '{engine}'，可选: {', '.join(EXPORT_ENGINES)}")
+            return False
+        
+        # 将可能的ID列设置为文本格式
+        if id_columns is None:
+            id_columns = DEFAULT_ID_COLUMNS
+        
+        prepared = []
+        for sheet_name, selected_columns in sheets:
+            result_df, image_column = _select_export_columns(df, selected_columns, download_images)
+            # 建立 URL -> 行位置 的索引
+            url_index = build_image_url_index(result_df[image_column]) if image_column else None
+            prepared.append((sheet_name, result_df, image_column, url_index))
+        
+        image_urls = list(dict.fromkeys(url for *_, url_index in prepared if url_index
+                                        for url in url_index[0]))
+        if any(image_column for _, _, image_column, _ in prepared) and not image_urls:
+            print("没有找到有效的图片URL")
+        
+        # 在写工作表之前开始下载和转换图片
+        pipeline = image_pipeline
+        own_pipeline = pipeline is None and bool(image_urls)
+        own_downloader = own_pipeline and image_downloader is None
+        if own_downloader:
+            image_downloader = ImageDownloader(ImageCache('images'))
+        
+        try:
+            if own_pipeline:
+                pipeline = ImagePipeline(image_downloader, image_workers).start(image_urls)
+            EXPORT_ENGINES[engine](prepared, output_file, id_columns, pipeline=pipeline)
+        finally:
+            if own_pipeline:
+                pipeline.finish()
+            if own_downloader:
+                image_downloader.close()
+                image_downloader.cache.close()
+        
+        print("\n导出成功!")
+        print(f"导出文件: {output_file}")
+        for sheet_name, result_df, image_column, _ in prepared:
+            if len(prepared) > 1:
+                print(f"工作表: {sheet_name}")
+            print(f"导出列数: {len(result_df.columns)}")
+            print(f"数据行数: {result_df.shape[0]}")
+            print(f"导出的列: {list(result_df.columns)}")
+        
+        image_columns = {image_column for _, _, image_column, _ in prepared if image_column}
+        if image_columns and pipeline is not None:
+            cache_dir = pipeline.cache_dir
+            print(f"图片处理: 从 {'、'.join(image_columns)} 列处理了图片并保存到 {cache_dir}/ 目录")
+        
+        return True
+    
+    except Exception as e:
+        import traceback
+        print(f"导出失败: {e}")
+        print(f"详细错误信息:\n{traceback.format_exc()}")
+        return False
+
+
+# 输出格式及其文件扩展名（第一个为默认扩展名）
+OUTPUT_FORMATS = {
+    'xlsx': ('.xlsx',),
+    'csv': ('.csv',),
+    'jsonl': ('.jsonl', '.ndjson'),
+    'parquet': ('.parquet', '.pq'),
+}
+
+# CSV/JSONL/Parquet 流式输出时每块的行数，Parquet 每块写为一个行组
+OUTPUT_CHUNK_SIZE = 50000
+
+
+def detect_output_format(output_file, output_format=None):
+    """确定输出格式：指定了 output_format 时直接使用，否则按输出文件扩展名判断，无法判断时为 xlsx"""
+    if output_format:
+        return output_format
+    lower = output_file.lower()
+    for fmt, extensions in OUTPUT_FORMATS.items():
+        if lower.endswith(extensions):
+            return fmt
+    return 'xlsx'
+
+
+def normalize_output_path(output_file, output_format):
+    """输出文件的扩展名与输出格式不一致时，追加该格式的默认扩展名"""
+    extensions = OUTPUT_FORMATS[output_format]
+    if not output_file.lower().endswith(extensions):
+        output_file += extensions[0]
+    return output_file
+
+
+def _frame_as_text(df):
+    """将带类型推断的DataFrame转换为文本列（用于计算行键、分组和估算大小），缺失值保持缺失
+
+    数值经过类型推断后无法还原原始文本（例如 200.50 变为 200.5），需要原始文本的输出应使用 text=True 读取。
+    """
+    import pandas as pd
+
+    df = df.copy()
+    for col in df.columns:
+        if not pd.api.types.is_string_dtype(df[col]):
+            text = df[col].map(lambda value: None if pd.isna(value) else _filter_text(value))
+            # 不使用 astype(str)：pandas 2 会把缺失值变成文本 'None'
+            df[col] = text.astype(object).where(df[col].notna(), None)
+    return df
+
+
+def read_excel_chunks(file_path, usecols, id_columns=None, filters=None, parse_cache=None,
+                      chunksize=OUTPUT_CHUNK_SIZE, resume=None):
+    """按块读取选中的列，产出DataFrame；所有值保留单元格文本，不做类型推断
+
+    不做类型推断保证每块的列类型一致（Parquet 各行组的结构相同），长数字ID也不会丢失精度。
+    每块分别规范化ID列。使用解析缓存时加载按单元格文本缓存的结果并分块。
+    resume 为 HtmlResumePoint 时只读取HTML表格中续读位置之后的行（不使用解析缓存）。
+    """
+    if id_columns is None:
+        id_columns = DEFAULT_ID_COLUMNS
+
+    if parse_cache is not None and parse_cache.available and resume is None:
+        df = _read_excel_cached(file_path, usecols, id_columns, parse_cache, filters, text=True)
+        for start in range(0, len(df), chunksize):
+            yield df.iloc[start:start + chunksize]
+        return
+
+    with profile_stage('read'):
+        if file_path.endswith('.xls'):
+            chunks = read_html_table_streaming(file_path, usecols=usecols, chunksize=chunksize,
+                                               str_columns=usecols, filters=filters, resume=resume)
+        else:
+            chunks = read_xlsx_streaming(file_path, usecols=usecols, filters=filters, chunksize=chunksize)
+    profile_add('read', bytes=os.path.getsize(file_path))
+    
+    while True:
+        with profile_stage('read') as stats:
+            chunk = next(chunks, None)
+            if chunk is not None:
+                stats['rows'] = len(chunk)
+        if chunk is None:
+            break
+        with profile_stage('normalize_ids') as stats:
+            normalize_id_columns(chunk, id_columns)
+            stats['rows'] = len(chunk)
+        yield chunk
+
+
+def _write_csv_chunks(chunks, output_file, columns, append=False):
+    """逐块追加写出CSV（UTF-8），返回写出的行数；append 为True时追加到已有文件末尾，不再写表头"""
+    import pandas as pd
+
+    rows = 0
+    with open(output_file, 'a' if append else 'w', encoding='utf-8', newline='') as f:
+        header = not append
+        for chunk in chunks:
+            chunk[columns].to_csv(f, header=header, index=False)
+            header = False
+            rows += len(chunk)
+        if header:
+            pd.DataFrame(columns=columns).to_csv(f, index=False)
+    return rows
+
+
+def _write_jsonl_chunks(chunks, output_file, columns, append=False):
+    """逐块追加写出JSON Lines，每行一条记录，空单元格为 null，返回写出的行数；append 为True时追加到已有文件末尾"""
+    rows = 0
+    with open(output_file, 'a' if append else 'w', encoding='utf-8') as f:
+        for chunk in chunks:
+            chunk = chunk[columns].astype(object)
+            records = chunk.where(chunk.notna(), None).itertuples(index=False, name=None)
+            f.writelines(json.dumps(dict(zip(columns, record)), ensure_ascii=False) + '\n'
+                         for record in records)
+            rows += len(chunk)
+    return rows
+
+
+def _write_parquet_chunks(chunks, output_file, columns, append=False):
+    """逐块写出Parquet，每块为一个行组，所有列为字符串类型，返回写出的行数（Parquet 文件不能追加）"""
+    if append:
+        raise ValueError("Parquet 文件不支持追加写入")
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError:
+        raise RuntimeError("写出 Parquet 需要安装 pyarrow (pip install pyarrow)")
+
+    schema = pa.schema([(str(col), pa.string()) for col in columns])
+    rows = 0
+    with pq.ParquetWriter(output_file, schema) as writer:
+        for chunk in chunks:
+            if len(chunk):
+                table = pa.Table.from_pandas(chunk[columns], schema=schema, preserve_index=False)
+                writer.write_table(table, row_group_size=len(chunk))
+                rows += len(chunk)
+    return rows
+
+
+STREAM_WRITERS = {
+    'csv': _write_csv_chunks,
+    'jsonl': _write_jsonl_chunks,
+    'parquet': _write_parquet_chunks,
+}
+
+# 可以直接追加到已有文件末尾的输出格式
+APPENDABLE_FORMATS = ('csv', 'jsonl')
+
+
+def export_stream(chunks, selected_columns, output_file, output_format, append=False):
+    """将按块读取的数据流式写出为 CSV/JSONL/Parquet，内存占用只与块大小有关
+
+    列顺序与 selected_columns 一致；append 为True时追加到已有文件末尾（仅 CSV/JSONL）。
+    返回写出的行数，失败时返回None。
+    """
+    try:
+        if output_format not in STREAM_WRITERS:
+            print(f"错误: 不支持的输出格式 '{output_format}'，可选: {', '.join(OUTPUT_FORMATS)}")
+            return None
+        
+        with profile_stage('write_output') as stats:
+            rows = STREAM_WRITERS[output_format](chunks, output_file, selected_columns, append=append)
+            stats['rows'] = rows
+        
+        print("\n导出成功!")
+        print(f"导出文件: {output_file}" + (" (追加)" if append else ""))
+        print(f"输出格式: {output_format}")
+        print(f"导出列数: {len(selected_columns)}")
+        print(f"数据行数: {rows}")
+        print(f"导出的列: {selected_columns}")
+        return rows
+    
+    except Exception as e:
+        print(f"导出失败: {e}")
+        return None
+
+
+def list_columns(columns):
+    """显示所有可用的列"""
+    print("\n可用的列:")
+    print("=" * 60)
+    for i, col in enumerate(columns, 1):
+        print(f"{i:2d}. {col}")
+    print("=" * 60)
+
+
+def create_image_downloader(options):
+    """根据配置创建图片下载器（包含其使用的图片缓存）"""
+    image_cache = ImageCache(options['cache_dir'], max_bytes=options.get('cache_max_bytes'),
+                             revalidate=options.get('cache_revalidate', False))
+    return ImageDownloader(image_cache,
+                           max_workers=options.get('download_workers', 8),
+                           per_host_limit=options.get('per_host_limit', 4),
+                           timeout=options.get('download_timeout', 30),
+                           max_retries=options.get('download_retries', 3))
+
+
+def resolve_selected_columns(input_file, columns_spec):
+    """只读取表头并解析列选择，返回 (全部列, 选中的列)；失败时选中的列为None"""
+    with profile_stage('resolve_columns'):
+        available_columns = read_column_names(input_file)
+        if available_columns is None:
+            return None, None
+        selected_columns = get_columns_from_input(columns_spec, available_columns)
+    
+    if not selected_columns:
+        print("错误: 没有找到有效的列")
+        return available_columns, None
+    return available_columns, selected_columns
+
+
+def default_incremental_state(output_file):
+    """增量导出的默认状态文件：与输出文件同目录，<输出文件名>.incremental.sqlite3"""
+    return output_file + '.incremental.sqlite3'
+
+
+class IncrementalState:
+    """增量导出的状态文件（sqlite）
+
+    记录已导出行的键（指定键列的值，未指定时为所选列内容的哈希）、每次输出的分片文件，
+    以及HTML输入的续读位置。再次导出时只解析文件中新增的部分（HTML且只在末尾追加时），
+    已导出过的行直接跳过，只为新增的行下载图片；CSV/JSONL 追加到原输出文件末尾，
+    xlsx/Parquet 的新增行写入新的分片文件 <输出文件名>_partNNNN.<扩展名>。
+    列选择、键列、过滤条件或输出文件变化，或者之前的输出文件已不存在时，重新全量导出。
+    状态只在输出成功写完后才更新，中断的导出不会导致漏行。
+    """
+
+    FORMAT_VERSION = 1
+    # 每条 IN 查询的键数量，不超过 sqlite 的参数个数限制
+    QUERY_BATCH = 500
+
+    def __init__(self, state_file):
+        directory = os.path.dirname(os.path.abspath(state_file))
+        os.makedirs(directory, exist_ok=True)
+        self.state_file = state_file
+        self.skipped = 0
+        self._config = None
+        self._reset = False
+        self._conn = sqlite3.connect(state_file, timeout=30)
+        with self._conn:
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS meta (name TEXT PRIMARY KEY, value TEXT NOT NULL)")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS rows (key TEXT PRIMARY KEY, part INTEGER NOT NULL)")
+            self._conn.execute("""
+                CREATE TABLE IF NOT EXISTS parts (
+                    part INTEGER PRIMARY KEY,
+                    path TEXT NOT NULL,
+                    rows INTEGER NOT NULL,
+                    updated_at REAL NOT NULL
+                )
+            """)
+
+    def _meta(self, name):
+        row = self._conn.execute("SELECT value FROM meta WHERE name = ?", (name,)).fetchone()
+        return row[0] if row else None
+
+    def parts(self):
+        """之前输出的分片，返回 [(分片号, 文件路径, 行数)]"""
+        if self._reset:
+            return []
+        return self._conn.execute("SELECT part, path, rows FROM parts ORDER BY part").fetchall()
+
+    @property
+    def first_run(self):
+        """本次是否为全量导出"""
+        return not self.parts()
+
+    def prepare(self, config):
+        """检查本次导出的配置，与上次不一致或之前的输出文件已不存在时改为全量导出"""
+        self._config = json.dumps(dict(config, version=self.FORMAT_VERSION), ensure_ascii=False,
+                                  sort_keys=True)
+        stored = self._meta('config')
+        if stored is None:
+            return
+        if stored != self._config:
+            print("增量导出: 列选择、键列、过滤条件或输出文件与上次不同，重新全量导出")
+            self._reset = True
+        elif any(not os.path.exists(path) for _, path, _ in self.parts()):
+            print("增量导出: 之前的输出文件已不存在，重新全量导出")
+            self._reset = True
+
+    def resume_point(self, file_path):
+        """HTML输入的续读位置：文件开头与上次解析过的内容相同时，从上次结束的位置继续"""
+        if self._reset:
+            return HtmlResumePoint()
+        return HtmlResumePoint.verify(file_path, int(self._meta('html_offset') or 0),
+                                      self._meta('html_hash'))
+
+    def next_part(self, output_file, output_format):
+        """本次写出的文件和是否追加，返回 (文件路径, 是否追加)"""
+        parts = self.parts()
+        if not parts:
+            return output_file, False
+        if output_format in APPENDABLE_FORMATS:
+            return parts[0][1], True
+        stem, extension = os.path.splitext(output_file)
+        return f"{stem}_part{parts[-1][0] + 1:04d}{extension}", False
+
+    def _known_keys(self, keys):
+        """keys 中已经导出过的键"""
+        if self._reset:
+            return set()
+        known = set()
+        for start in range(0, len(keys), self.QUERY_BATCH):
+            batch = keys[start:start + self.QUERY_BATCH]
+            placeholders = ','.join('?' * len(batch))
+            known.update(row[0] for row in self._conn.execute(
+                f"SELECT key FROM rows WHERE key IN ({placeholders})", batch))
+        return known
+
+    def select_new(self, df, columns, key_column=None, new_keys=None):
+        """只保留之前没有导出过的行；新行的键追加到 new_keys 中，提交时写入状态文件
+
+        df 应按单元格文本读取：类型推断的结果取决于一起读取的行（例如某一行出现文本会让整列不再是数值），
+        按文本计算的键不随每次读取的范围变化。
+        """
+        import pandas as pd
+
+        if key_column:
+            keys = _frame_as_text(df[[key_column]])[key_column].fillna('')
+        else:
+            hashes = pd.util.hash_pandas_object(_frame_as_text(df[list(columns)]), index=False)
+            keys = hashes.map('{:016x}'.format)
+        known = self._known_keys(list(keys.unique()))
+        mask = ~keys.isin(known).to_numpy()
+        self.skipped += int(len(df) - mask.sum())
+        if new_keys is not None:
+            new_keys.extend(keys[mask])
+        return df[mask].reset_index(drop=True)
+
+    def commit(self, output_path, rows, appended, keys, resume=None):
+        """输出成功写完后更新状态：新行的键、分片文件和续读位置"""
+        now = time.time()
+        with self._conn:
+            if self._reset:
+                for table in ('meta', 'rows', 'parts'):
+                    self._conn.execute(f"DELETE FROM {table}")
+                self._reset = False
+            parts = self.parts()
+            if appended:
+                part = parts[0][0]
+                self._conn.execute("UPDATE parts SET rows = rows + ?, updated_at = ? WHERE part = ?",
+                                   (rows, now, part))
+            elif rows or not parts:
+                part = parts[-1][0] + 1 if parts else 1
+                self._conn.execute("INSERT INTO parts (part, path, rows, updated_at) VALUES (?, ?, ?, ?)",
+                                   (part, output_path, rows, now))
+            if keys:
+                self._conn.executemany("INSERT OR IGNORE INTO rows (key, part) VALUES (?, ?)",
+                                       ((key, part) for key in keys))
+            meta = {'config': self._config, 'updated_at': str(now)}
+            if resume is not None:
+                meta.update(html_offset=str(resume.offset), html_hash=resume.hexdigest())
+            self._conn.executemany("INSERT OR REPLACE INTO meta (name, value) VALUES (?, ?)",
+                                   meta.items())
+            if resume is None:
+                self._conn.execute("DELETE FROM meta WHERE name IN ('html_offset', 'html_hash')")
+
+    def close(self):
+        """关闭状态数据库连接"""
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+
+
+def run_incremental_export(input_file, output_file, selected_columns, state_file, key_column=None,
+                           download_images=False, id_columns=None, engine='openpyxl',
+                           image_downloader=None, image_workers=None, filters=None,
+                           output_format='xlsx'):
+    """增量导出：只导出上次导出之后新增的行，返回 (是否成功, 本次导出行数)
+
+    状态保存在 state_file 中，说明见 IncrementalState。
+    """
+    state = IncrementalState(state_file)
+    try:
+        state.prepare({
+            'output': os.path.abspath(output_file),
+            'format': output_format,
+            'columns': list(selected_columns),
+            'key_column': key_column,
+            'filters': [str(f) for f in filters or ()],
+        })
+        read_columns = list(dict.fromkeys(list(selected_columns) + ([key_column] if key_column else [])))
+        resume = state.resume_point(input_file) if input_file.endswith('.xls') else None
+        if resume is not None and resume.offset:
+            print(f"增量导出: 文件前 {resume.offset / 1024 / 1024:.1f} MB 与上次相同，只解析之后新增的行")
+        target, append = state.next_part(output_file, output_format)
+        first_run = state.first_run
+        new_keys = []
+        
+        def keep_new(df):
+            with profile_stage('incremental_filter') as stats:
+                stats['rows'] = len(df)
+                return state.select_new(df, selected_columns, key_column, new_keys)
+        
+        if output_format == 'xlsx':
+            # 按单元格文本计算键，只对新增的行做类型推断
+            df = read_excel_file(input_file, usecols=read_columns, id_columns=id_columns,
+                                 filters=filters, resume=resume, text=True)
+            if df is None:
+                return False, 0
+            df = keep_new(df)
+            if input_file.endswith('.xls'):
+                df = _infer_frame_types(df, id_columns or DEFAULT_ID_COLUMNS)
+            rows = len(df)
+            if rows or first_run:
+                success = export_columns(df, list(selected_columns), target, download_images,
+                                         id_columns=id_columns, engine=engine,
+                                         image_downloader=image_downloader,
+                                         image_workers=image_workers)
+            else:
+                success = True
+        else:
+            size_before = os.path.getsize(target) if append else None
+            chunks = read_excel_chunks(input_file, read_columns, id_columns=id_columns,
+                                       filters=filters, resume=resume)
+            rows = export_stream((keep_new(chunk) for chunk in chunks), list(selected_columns),
+                                 target, output_format, append=append)
+            success = rows is not None
+            if not success and append:
+                # 撤销写了一半的追加内容，下次重新导出这些行
+                with open(target, 'r+b') as f:
+                    f.truncate(size_before)
+            elif success and not rows and not append and not first_run:
+                # 没有新增行时不保留空的分片文件
+                os.remove(target)
+            rows = rows or 0
+        
+        if not success:
+            return False, 0
+        
+        state.commit(target, rows, append, new_keys, resume)
+        if rows:
+            print(f"增量导出: 新增 {rows} 行 -> {target}，跳过之前已导出的 {state.skipped} 行")
+        else:
+            print(f"增量导出: 没有新增的行，跳过之前已导出的 {state.skipped} 行")
+        parts = state.parts()
+        if len(parts) > 1:
+            print(f"输出分片: {len(parts)} 个文件，共 {sum(part[2] for part in parts)} 行")
+        return True, rows
+    finally:
+        state.close()
+
+
+def run_export(input_file, output_file, columns_spec, download_images=False, id_columns=None,
+               engine='openpyxl', image_downloader=None, image_workers=None, parse_cache=None,
+               filters=None, output_format=None, incremental=None, key_column=None):
+    """读取输入文件并导出选中的列，返回 (是否成功, 导出行数)
+
+    先只读取表头并解析列选择，之后只读取选中的列。
+    output_format 为 None 时按输出文件扩展名确定格式；CSV/JSONL/Parquet 边读边写。
+    incremental 为状态文件路径时进行增量导出，只导出上次之后新增的行；key_column 为识别行的键列。
+    """
+    available_columns, selected_columns = resolve_selected_columns(input_file, columns_spec)
+    if not selected_columns or not check_filter_columns(filters, available_columns):
+        return False, 0
+    
+    output_format = detect_output_format(output_file, output_format)
+    if output_format != 'xlsx' and download_images:
+        print(f"提示: 图片只能嵌入 xlsx 文件，{output_format} 格式不下载图片")
+    
+    if incremental:
+        if key_column and key_column not in available_columns:
+            print(f"错误: 键列 '{key_column}' 不存在")
+            return False, 0
+        return run_incremental_export(input_file, output_file, selected_columns, incremental,
+                                      key_column=key_column, download_images=download_images,
+                                      id_columns=id_columns, engine=engine,
+                                      image_downloader=image_downloader,
+                                      image_workers=image_workers, filters=filters,
+                                      output_format=output_format)
+    
+    # CSV/JSONL/Parquet：按块读取并直接写出，不构建完整的DataFrame
+    if output_format != 'xlsx':
+        chunks = read_excel_chunks(input_file, selected_columns, id_columns=id_columns,
+                                   filters=filters, parse_cache=parse_cache)
+        rows = export_stream(chunks, selected_columns, output_file, output_format)
+        return rows is not None, rows or 0
+    
+    # 读取Excel文件
+    df = read_excel_file(input_file, usecols=selected_columns, id_columns=id_columns,
+                         parse_cache=parse_cache, filters=filters)
+    if df is None:
+        return False, 0
+    
+    # 导出数据
+    success = export_columns(df, selected_columns, output_file, download_images,
+                             id_columns=id_columns, engine=engine,
+                             image_downloader=image_downloader,
+                             image_workers=image_workers)
+    return success, len(df)
+
+
+# 批处理支持的输入文件和清单文件扩展名
+BATCH_INPUT_EXTENSIONS = ('.xls', '.xlsx')
+BATCH_MANIFEST_EXTENSIONS = ('.txt', '.csv', '.tsv', '.lst')
+
+
+def _default_batch_output(input_file, output_dir=None, output_format=None):
+    """批处理的默认输出文件：<输出目录>/<输入文件名>_filtered.<输出格式扩展名>"""
+    stem = os.path.splitext(os.path.basename(input_file))[0]
+    directory = output_dir or os.path.dirname(input_file)
+    extension = OUTPUT_FORMATS[output_format or 'xlsx'][0]
+    return os.path.join(directory, f"{stem}_filtered{extension}")
+
+
+def _read_batch_manifest(manifest_file, output_dir=None, output_format=None):
+    """读取批处理清单：每行一个任务，格式为 "输入文件<TAB或逗号>输出文件"
+
+    输出文件可以省略；空行和 # 开头的行会被忽略；相对路径相对于清单文件所在目录。
+    未指定 output_format 时，每个输出文件的格式由其扩展名决定。
+    """
+    base_dir = os.path.dirname(os.path.abspath(manifest_file))
+    jobs = []
+    with open(manifest_file, encoding='utf-8-sig') as f:
+        for line in f:
+            line = line.strip()
+            if not line or line.startswith('#'):
+                continue
+            parts = [part.strip() for part in re.split(r'[\t,]', line, maxsplit=1)]
+            input_file = os.path.join(base_dir, parts[0])
+            if len(parts) > 1 and parts[1]:
+                output_file = os.path.join(base_dir, parts[1])
+                output_file = normalize_output_path(output_file, detect_output_format(output_file, output_format))
+            else:
+                output_file = _default_batch_output(input_file, output_dir, output_format)
+            jobs.append((input_file, output_file))
+    return jobs
+
+
+def resolve_batch_jobs(spec, output_dir=None, output_format=None):
+    """解析批处理输入，返回 [(输入文件, 输出文件)]
+
+    spec 可以是目录（处理其中所有 .xls/.xlsx 文件）、清单文件（.txt/.csv/.tsv/.lst）或通配符。
+    目录和通配符中的批处理输出文件不作为输入：输入文件旁边与其同名的 <文件名>_filtered.xlsx，
+    以及 output_dir 中所有 *_filtered.xlsx（扩展名随输出格式变化），重复运行时不会把上次的输出再处理一遍。
+    """
+    if os.path.isdir(spec):
+        inputs = [os.path.join(spec, name) for name in sorted(os.listdir(spec))]
+    elif os.path.isfile(spec) and spec.lower().endswith(BATCH_MANIFEST_EXTENSIONS):
+        return _read_batch_manifest(spec, output_dir, output_format)
+    else:
+        inputs = sorted(glob.glob(spec))
+    
+    inputs = [path for path in inputs
+              if os.path.isfile(path) and path.lower().endswith(BATCH_INPUT_EXTENSIONS)]
+    stems = {os.path.splitext(os.path.abspath(path))[0] for path in inputs}
+    output_root = os.path.abspath(output_dir) if output_dir else None
+    output_extension = OUTPUT_FORMATS[output_format or 'xlsx'][0]
+    
+    def is_batch_output(path):
+        stem, extension = os.path.splitext(os.path.abspath(path))
+        if not stem.endswith('_filtered'):
+            return False
+        if os.path.dirname(stem) == output_root:
+            return extension.lower() == output_extension
+        return stem[:-len('_filtered')] in stems
+    
+    skipped = [path for path in inputs if is_batch_output(path)]
+    if skipped:
+        print(f"跳过 {len(skipped)} 个批处理输出文件: {', '.join(os.path.basename(path) for path in skipped[:3])}"
+              f"{' 等' if len(skipped) > 3 else ''}")
+    return [(path, _default_batch_output(path, output_dir, output_format))
+            for path in inputs if path not in skipped]
+
+
+# 批处理工作进程中复用的图片下载器和解析缓存，由 _init_batch_worker 创建
+_batch_downloader = None
+_batch_parse_cache = None
+
+
+def _init_batch_worker(options):
+    """批处理工作进程的初始化：每个进程只创建一次图片下载器和解析缓存，在它处理的所有文件之间复用"""
+    global _batch_downloader, _batch_parse_cache
+    if options['download_images']:
+        _batch_downloader = create_image_downloader(options)
+    if options.get('parse_cache_dir'):
+        _batch_parse_cache = ParseCache(options['parse_cache_dir'])
+
+
+def _run_batch_job(job, columns_spec, options):
+    """处理批处理中的一个文件，返回结果统计；该文件的输出日志只在失败时返回"""
+    input_file, output_file = job
+    log = io.StringIO()
+    started = time.perf_counter()
+    profiler = enable_profiling() if options.get('profile') else None
+    try:
+        with contextlib.redirect_stdout(log):
+            success, rows = run_export(input_file, output_file, columns_spec,
+                                       download_images=options['download_images'],
+                                       id_columns=options['id_columns'],
+                                       engine=options['engine'],
+                                       image_downloader=_batch_downloader,
+                                       parse_cache=_batch_parse_cache,
+                                       filters=options.get('filters'),
+                                       output_format=options.get('output_format'),
+                                       image_workers=options['image_workers'],
+                                       incremental=(default_incremental_state(output_file)
+                                                    if options.get('incremental') else None),
+                                       key_column=options.get('key_column'))
+    except Exception as e:
+        success, rows = False, 0
+        log.write(f"\n处理出错: {e}\n")
+    finally:
+        if profiler:
+            disable_profiling()
+    
+    return {
+        'input': input_file,
+        'output': output_file,
+        'success': success,
+        'rows': rows,
+        'input_bytes': os.path.getsize(input_file) if os.path.exists(input_file) else 0,
+        'seconds': time.perf_counter() - started,
+        'log': '' if success else log.getvalue(),
+        'stats': profiler.summary() if profiler else None,
+    }
+
+
+def _print_batch_result(index, total, result):
+    """打印批处理中单个文件的结果"""
+    seconds = result['seconds'] or 1e-9
+    if result['success']:
+        print(f"[{index}/{total}] ✅ {result['input']} -> {result['output']} | "
+              f"{result['rows']} 行, {result['seconds']:.2f} 秒, "
+              f"{result['rows'] / seconds:.0f} 行/秒, {result['input_bytes'] / 1024 / 1024 / seconds:.2f} MB/秒")
+    else:
+        print(f"[{index}/{total}] ❌ {result['input']} 处理失败")
+        tail = [line for line in result['log'].splitlines() if line.strip()][-10:]
+        for line in tail:
+            print(f"    {line}")
+
+
+def _pool_worker_options(options, workers, profile=False):
+    """工作进程使用的配置
+
+    下载并发数和每个主机的连接数在工作进程之间平分，保持总量不变；
+    缓存淘汰在全部任务完成后由主进程统一进行，避免删除其他进程正在使用的图片。
+    """
+    worker_options = dict(options)
+    worker_options['cache_max_bytes'] = None
+    worker_options['profile'] = profile
+    if workers > 1:
+        worker_options['download_workers'] = max(1, options['download_workers'] // workers)
+        if options['per_host_limit']:
+            worker_options['per_host_limit'] = max(1, options['per_host_limit'] // workers)
+        # 任务之间已经并行，工作进程内部不再启动图片解码进程池
+        worker_options['image_workers'] = 1
+    return worker_options
+
+
+def _run_in_worker_pool(func, jobs, args, worker_options, workers, on_result):
+    """用 workers 个工作进程执行 func(job, *args)，每完成一个任务调用 on_result(序号, 结果)
+
+    每个工作进程只启动一次并通过 _init_batch_worker 初始化，图片下载器和解析缓存在它处理的所有任务之间复用；
+    只有一个工作进程时直接在当前进程中执行。
+    """
+    global _batch_downloader, _batch_parse_cache
+    if workers == 1:
+        _init_batch_worker(worker_options)
+        try:
+            for index, job in enumerate(jobs, 1):
+                on_result(index, func(job, *args))
+        finally:
+            if _batch_downloader:
+                _batch_downloader.close()
+                _batch_downloader.cache.close()
+                _batch_downloader = None
+            if _batch_parse_cache:
+                _batch_parse_cache.close()
+                _batch_parse_cache = None
+        return
+    
+    with ProcessPoolExecutor(max_workers=workers,
+                             mp_context=multiprocessing.get_context('spawn'),
+                             initializer=_init_batch_worker,
+                             initargs=(worker_options,)) as executor:
+        futures = [executor.submit(func, job, *args) for job in jobs]
+        for index, future in enumerate(as_completed(futures), 1):
+            on_result(index, future.result())
+
+
+def _evict_image_cache(options, since):
+    """全部任务完成后按磁盘预算淘汰图片缓存，保留 since 之后用到的图片"""
+    if options['download_images'] and options.get('cache_max_bytes') is not None:
+        cache = ImageCache(options['cache_dir'], max_bytes=options['cache_max_bytes'])
+        removed_files, freed_bytes = cache.evict(keep_since=since)
+        cache.close()
+        if removed_files:
+            print(f"缓存淘汰: 删除 {removed_files} 个文件，释放 {freed_bytes / 1024 / 1024:.2f} MB")
+
+
+def process_batch(jobs, columns_spec, options, batch_workers=None, profiler=None):
+    """在进程池中并行处理多个文件，打印每个文件和汇总的吞吐量，全部成功时返回True
+
+    每个工作进程只启动一次（Python/pandas 的导入开销只付一次），并复用同一个图片下载器；
+    所有进程共用同一个图片缓存目录，同一张图片在整个批次中只下载一次。
+    profiler 为 StageProfiler 时，各文件的阶段统计在工作进程中记录后合并到其中。
+    """
+    if batch_workers is None:
+        batch_workers = min(len(jobs), os.cpu_count() or 1)
+    batch_workers = max(1, min(batch_workers, len(jobs)))
+    
+    for _, output_file in jobs:
+        output_dir = os.path.dirname(output_file)
+        if output_dir:
+            os.makedirs(output_dir, exist_ok=True)
+    
+    worker_options = _pool_worker_options(options, batch_workers, profile=profiler is not None)
+    
+    print(f"批处理: {len(jobs)} 个文件，{batch_workers} 个工作进程")
+    batch_started = time.time()
+    wall_started = time.perf_counter()
+    results = []
+    
+    def record(index, result):
+        results.append(result)
+        _print_batch_result(index, len(jobs), result)
+        if profiler is not None and result['stats']:
+            profiler.merge(result['stats'], input=result['input'], output=result['output'],
+                           success=result['success'], rows=result['rows'])
+    
+    _run_in_worker_pool(_run_batch_job, jobs, (columns_spec, worker_options), worker_options,
+                        batch_workers, record)
+    wall_seconds = time.perf_counter() - wall_started
+    _evict_image_cache(options, batch_started)
+    
+    succeeded = [result for result in results if result['success']]
+    total_rows = sum(result['rows'] for result in succeeded)
+    total_bytes = sum(result['input_bytes'] for result in succeeded)
+    print("\n批处理汇总:")
+    print("=" * 60)
+    print(f"文件数: {len(jobs)} (成功: {len(succeeded)}, 失败: {len(jobs) - len(succeeded)})")
+    print(f"总行数: {total_rows}")
+    print(f"输入大小: {total_bytes / 1024 / 1024:.2f} MB")
+    print(f"总耗时: {wall_seconds:.2f} 秒")
+    print(f"吞吐量: {total_rows / wall_seconds:.0f} 行/秒, {total_bytes / 1024 / 1024 / wall_seconds:.2f} MB/秒, "
+          f"{len(succeeded) / wall_seconds:.2f} 文件/秒")
+    print("=" * 60)
+    
+    return len(succeeded) == len(jobs)
+
+
+# 按目标大小切分时估算输出文件大小：每行单元格文本的UTF-8字节数乘以该系数
+# （xlsx 为压缩后的XML，Parquet 按列压缩），JSON Lines 另加每行重复的列名
+SHARD_SIZE_RATIOS = {'xlsx': 0.6, 'csv': 1.0, 'jsonl': 1.0, 'parquet': 0.3}
+# 估算缩略图大小时抽样的图片数
+THUMBNAIL_SAMPLE_SIZE = 20
+
+
+def default_shard_index(output_file):
+    """分片索引文件：<输出文件>.index.json"""
+    return output_file + '.index.json'
+
+
+def _safe_filename(text, max_length=60):
+    """将分组值转换为可以用作文件名的文本"""
+    name = re.sub(r'[\\/:*?"<>|\s]+', '_', str(text)).strip('._')
+    return name[:max_length] or '空'
+
+
+def _estimate_thumbnail_bytes(image_paths):
+    """抽样生成缩略图，返回每张缩略图的平均字节数；无法估算时返回0"""
+    sizes = []
+    for path in list(image_paths)[:THUMBNAIL_SAMPLE_SIZE]:
+        prepared = _prepare_excel_image(path)
+        if prepared:
+            sizes.append(len(prepared[0]))
+    return sum(sizes) / len(sizes) if sizes else 0
+
+
+def estimate_row_bytes(df, columns, output_format, image_column=None, image_bytes=0):
+    """估算每行在输出文件中占用的字节数，返回numpy数组"""
+    text = _frame_as_text(df[list(columns)])
+    row_bytes = sum(text[col].fillna('').str.encode('utf-8').str.len().to_numpy() for col in columns)
+    row_bytes = row_bytes * SHARD_SIZE_RATIOS[output_format]
+    if output_format == 'jsonl':
+        row_bytes = row_bytes + sum(len(json.dumps(str(col), ensure_ascii=False).encode('utf-8')) + 4
+                                    for col in columns)
+    if image_column and image_bytes:
+        has_image = df[image_column].fillna('').astype(str).str.strip().ne('').to_numpy()
+        row_bytes = row_bytes + has_image * image_bytes
+    return row_bytes
+
+
+def plan_shards(df, output_file, shard_rows=None, shard_by=None, shard_bytes=None, row_bytes=None):
+    """将数据划分为分片，返回 [(分片文件, 分组值, 行位置数组)]
+
+    shard_by 指定时每个分组值一个分片（按值排序），文件名为 <输出文件名>_<分组值>；
+    shard_rows / shard_bytes 指定时再按行数或估算大小（row_bytes）切分，文件名追加 _partNNNN。
+    """
+    import numpy as np
+
+    stem, extension = os.path.splitext(output_file)
+    if shard_by:
+        keys = _frame_as_text(df[[shard_by]])[shard_by].fillna('')
+        groups = sorted(keys.groupby(keys.to_numpy()).indices.items())
+    else:
+        groups = [(None, np.arange(len(df)))]
     
-    with ThreadPoolExecutor(max_workers=max_workers) as executor:
-        # 提交所有下载任务
-        future_to_url = {
-            executor.submit(download_single_image, url, output_dir): url 
-            for url in urls if pd.notna(url) and str(url).strip()
-        }
+    shards = []
+    used_names = set()
+    for value, positions in groups:
+        pieces = [positions]
+        if shard_bytes and row_bytes is not None and len(positions):
+            # 每行归入其起始位置所在的分片，每个分片最多超出目标大小一行
+            cumulative = np.cumsum(row_bytes[positions])
+            piece_ids = ((cumulative - row_bytes[positions]) // shard_bytes).astype(int)
+            pieces = [positions[piece_ids == piece_id] for piece_id in np.unique(piece_ids)]
+        if shard_rows:
+            pieces = [piece[start:start + shard_rows]
+                      for piece in pieces for start in range(0, max(len(piece), 1), shard_rows)]
         
-        completed = 0
-        total = len(future_to_url)
+        if value is None:
+            base = stem
+        else:
+            base = f"{stem}_{_safe_filename(value)}"
+            # 不同的分组值转换后可能得到相同的文件名
+            suffix = 2
+            while base in used_names:
+                base = f"{stem}_{_safe_filename(value)}_{suffix}"
+                suffix += 1
+            used_names.add(base)
         
-        # 处理完成的任务
-        for future in as_completed(future_to_url):
-            url = future_to_url[future]
-            try:
-                filepath, original_url = future.result()
-                if filepath and os.path.exists(filepath):
-                    results[original_url] = filepath
-                else:
-                    failed_urls.append(original_url)
-                    if filepath:
-                        print(f"下载的文件不存在: {filepath}")
-            except Exception as e:
-                print(f"下载异常 {url}: {e}")
-                failed_urls.append(url)
-            
-            completed += 1
-            print(f"下载进度: {completed}/{total} (成功: {len(results)}, 失败: {len(failed_urls)})", end='\r')
+        for number, piece in enumerate(pieces, 1):
+            if value is None or len(pieces) > 1:
+                path = f"{base}_part{number:04d}{extension}"
+            else:
+                path = f"{base}{extension}"
+            shards.append((path, value, piece))
+    return shards
+
+
+def _run_shard_job(job, selected_columns, options):
+    """在工作进程中写出一个分片，返回结果统计；该分片的输出日志只在失败时返回
+
+    job 为 (输出文件, DataFrame, 缩略图)：缩略图为主进程生成的 URL -> 缩略图 字典时直接插入这些缩略图，
+    为None时从共用的图片缓存读取图片并生成缩略图。
+    selected_columns 为None时写出 frame 的所有列（多组列导出中各组的列不同）。
+    """
+    output_file, frame, images = job
+    if selected_columns is None:
+        selected_columns = list(frame.columns)
+    output_format = detect_output_format(output_file, options.get('output_format'))
+    log = io.StringIO()
+    started = time.perf_counter()
+    profiler = enable_profiling() if options.get('profile') else None
+    try:
+        with contextlib.redirect_stdout(log):
+            if output_format == 'xlsx':
+                success = export_columns(frame, selected_columns, output_file, options['download_images'],
+                                         id_columns=options['id_columns'], engine=options['engine'],
+                                         image_downloader=_batch_downloader,
+                                         image_workers=options['image_workers'],
+                                         image_pipeline=(PreparedImages(images, options['cache_dir'])
+                                                         if images is not None else None))
+            else:
+                success = export_stream(iter([frame]), selected_columns, output_file, output_format) is not None
+    except Exception as e:
+        success = False
+        log.write(f"\n处理出错: {e}\n")
+    finally:
+        if profiler:
+            disable_profiling()
+    
+    return {
+        'output': output_file,
+        'success': success,
+        'rows': len(frame),
+        'bytes': os.path.getsize(output_file) if success and os.path.exists(output_file) else 0,
+        'seconds': time.perf_counter() - started,
+        'log': '' if success else log.getvalue(),
+        'stats': profiler.summary() if profiler else None,
+    }
+
+
+def _read_for_export(input_file, columns, output_format, options):
+    """一次读取导出需要的所有列，返回完整的DataFrame，失败返回None
+
+    xlsx 输出按类型推断读取；CSV/JSONL/Parquet 输出与直接导出时一样保留单元格文本。
+    """
+    import pandas as pd
+
+    parse_cache = ParseCache(options['parse_cache_dir']) if options.get('parse_cache_dir') else None
+    try:
+        if output_format == 'xlsx':
+            return read_excel_file(input_file, usecols=columns, id_columns=options['id_columns'],
+                                   parse_cache=parse_cache, filters=options.get('filters'))
+        chunks = list(read_excel_chunks(input_file, columns, id_columns=options['id_columns'],
+                                        filters=options.get('filters'), parse_cache=parse_cache))
+        return (pd.concat(chunks, ignore_index=True) if chunks
+                else pd.DataFrame(columns=columns, dtype=str))
+    finally:
+        if parse_cache:
+            parse_cache.close()
+
+
+def _frame_chunks(df, chunksize=OUTPUT_CHUNK_SIZE):
+    """把DataFrame切分为块，供 export_stream 写出"""
+    for start in range(0, len(df), chunksize):
+        yield df.iloc[start:start + chunksize]
+
+
+def _prefetch_images(df, options, thumbnails=False):
+    """在主进程中一次性处理 IMAGE_COLUMN 列的所有图片，供多个工作进程共用
+
+    thumbnails 为False时只下载到共用的图片缓存，返回 URL -> 本地文件路径（分片导出：各进程的图片互不相同，
+    各自生成缩略图）；为True时同时生成缩略图，返回 URL -> 缩略图（多组列导出：各组的图片相同，只生成一次）。
+    同一张图片不会被多个进程重复下载。
+    """
+    image_urls, _, _ = build_image_url_index(df[IMAGE_COLUMN])
+    downloader = create_image_downloader(options)
+    try:
+        if not thumbnails:
+            return downloader.download_all(image_urls)
+        pipeline = ImagePipeline(downloader, options.get('image_workers')).start(image_urls)
+        try:
+            return {url: pipeline.result(url) for url in image_urls}
+        finally:
+            pipeline.finish()
+    finally:
+        downloader.close()
+        downloader.cache.close()
+
+
+def run_sharded_export(input_file, output_file, columns_spec, options, shard_rows=None, shard_by=None,
+                       shard_bytes=None, shard_workers=None, profiler=None):
+    """分片导出：把数据按行数、分组列或目标大小切分为多个文件，由多个工作进程同时写出
+
+    输入只解析一次；需要下载图片时先在主进程中一次性下载所有图片到共用的图片缓存，
+    各工作进程只生成缩略图并插入图片。所有分片写完后生成索引文件 <输出文件>.index.json。
+    返回 (是否全部成功, 导出行数)。
+    """
+    available_columns, selected_columns = resolve_selected_columns(input_file, columns_spec)
+    if not selected_columns:
+        return False, 0
+    if shard_by and shard_by not in available_columns:
+        print(f"错误: 分片列 '{shard_by}' 不存在")
+        return False, 0
+    if not check_filter_columns(options.get('filters'), available_columns):
+        return False, 0
+    
+    output_format = detect_output_format(output_file, options.get('output_format'))
+    read_columns = list(dict.fromkeys(list(selected_columns) + ([shard_by] if shard_by else [])))
+    df = _read_for_export(input_file, read_columns, output_format, options)
+    if df is None:
+        return False, 0
+    
+    image_column = None
+    image_bytes = 0
+    if options['download_images'] and output_format == 'xlsx' and IMAGE_COLUMN in selected_columns:
+        image_column = IMAGE_COLUMN
+    elif options['download_images'] and output_format != 'xlsx':
+        print(f"提示: 图片只能嵌入 xlsx 文件，{output_format} 格式不下载图片")
+    
+    started_at = time.time()
+    if image_column:
+        # 所有图片先下载一次，各分片从共用的缓存中读取
+        paths = _prefetch_images(df, options)
+        if shard_bytes:
+            image_bytes = _estimate_thumbnail_bytes(paths.values())
+    
+    row_bytes = None
+    if shard_bytes:
+        row_bytes = estimate_row_bytes(df, selected_columns, output_format, image_column, image_bytes)
+    shards = plan_shards(df, output_file, shard_rows=shard_rows, shard_by=shard_by,
+                         shard_bytes=shard_bytes, row_bytes=row_bytes)
     
-    print(f"\n下载完成！成功: {len(results)}, 失败: {len(failed_urls)}")
+    if shard_workers is None:
+        shard_workers = os.cpu_count() or 1
+    shard_workers = max(1, min(shard_workers, len(shards)))
+    output_dir = os.path.dirname(output_file)
+    if output_dir:
+        os.makedirs(output_dir, exist_ok=True)
     
-    if failed_urls:
-        print("失败的URL示例:", failed_urls[:3])
+    # 图片已经下载，工作进程只从缓存读取；输入已经解析，工作进程不需要解析缓存
+    worker_options = _pool_worker_options(dict(options, output_format=output_format, parse_cache_dir=None),
+                                          shard_workers, profile=profiler is not None)
+    jobs = [(path, df.iloc[positions][list(selected_columns)].reset_index(drop=True), None)
+            for path, _, positions in shards]
+    keys = {path: value for path, value, _ in shards}
+    del df
     
-    return results
+    print(f"\n分片导出: {len(shards)} 个分片，{shard_workers} 个工作进程")
+    wall_started = time.perf_counter()
+    results = []
+    
+    def record(index, result):
+        results.append(result)
+        if result['success']:
+            print(f"[{index}/{len(shards)}] ✅ {result['output']} | {result['rows']} 行 | "
+                  f"{result['bytes'] / 1024 / 1024:.2f} MB | {result['seconds']:.2f} 秒")
+        else:
+            print(f"[{index}/{len(shards)}] ❌ {result['output']}")
+            for line in result['log'].strip().splitlines()[-5:]:
+                print(f"    {line}")
+        if profiler is not None and result['stats']:
+            profiler.merge(result['stats'], output=result['output'], success=result['success'],
+                           rows=result['rows'])
+    
+    _run_in_worker_pool(_run_shard_job, jobs, (list(selected_columns), worker_options), worker_options,
+                        shard_workers, record)
+    wall_seconds = time.perf_counter() - wall_started
+    _evict_image_cache(options, started_at)
+    
+    # 索引文件按分片顺序列出所有分片，路径相对于索引文件所在目录
+    index_file = default_shard_index(output_file)
+    index_dir = os.path.dirname(os.path.abspath(index_file))
+    by_output = {result['output']: result for result in results}
+    index = {
+        'version': 1,
+        'created_at': datetime.now().isoformat(timespec='seconds'),
+        'input': os.path.abspath(input_file),
+        'format': output_format,
+        'columns': list(selected_columns),
+        'shard_by': shard_by,
+        'shard_rows': shard_rows,
+        'shard_bytes': shard_bytes,
+        'rows': sum(result['rows'] for result in results if result['success']),
+        'shards': [{
+            'file': os.path.relpath(os.path.abspath(path), index_dir),
+            'key': keys[path],
+            'rows': by_output[path]['rows'],
+            'bytes': by_output[path]['bytes'],
+            'success': by_output[path]['success'],
+        } for path, *_ in jobs],
+    }
+    with open(index_file, 'w', encoding='utf-8') as f:
+        json.dump(index, f, ensure_ascii=False, indent=2)
+    
+    succeeded = [result for result in results if result['success']]
+    total_bytes = sum(result['bytes'] for result in succeeded)
+    print("\n分片导出汇总:")
+    print("=" * 60)
+    print(f"分片数: {len(shards)} (成功: {len(succeeded)}, 失败: {len(shards) - len(succeeded)})")
+    print(f"总行数: {index['rows']}")
+    print(f"输出大小: {total_bytes / 1024 / 1024:.2f} MB")
+    print(f"写出耗时: {wall_seconds:.2f} 秒 ({index['rows'] / max(wall_seconds, 1e-9):.0f} 行/秒)")
+    print(f"索引文件: {index_file}")
+    print("=" * 60)
+    return len(succeeded) == len(shards), index['rows']
 
 
-def export_columns(df, selected_columns, output_file, download_images=False):
-    """导出指定列到Excel文件"""
-    try:
+# -c 的 名称=列选择 写法
+_SELECTION_NAME_RE = re.compile(r'^\s*([^,=]+?)\s*=(.+)$')
+
+
+def parse_column_selections(specs):
+    """解析多个 -c 参数，返回 [(名称, 列选择)]
+
+    每个参数可以写为 名称=列选择；未写名称时，只有一个 -c 的名称为None（普通导出），
+    否则依次命名为 selection1、selection2……。名称重复时抛出 ValueError。
+    """
+    selections = []
+    for index, spec in enumerate(specs, 1):
+        match = _SELECTION_NAME_RE.match(spec)
+        if match:
+            selections.append((match.group(1), match.group(2).strip()))
+        else:
+            selections.append((f"selection{index}" if len(specs) > 1 else None, spec))
+    
+    names = [name for name, _ in selections if name is not None]
+    duplicates = sorted({name for name in names if names.count(name) > 1})
+    if duplicates:
+        raise ValueError(f"列选择的名称重复: {', '.join(duplicates)}")
+    return selections
+
+
+def default_selection_output(output_file, name):
+    """多组列导出时每组的输出文件：<输出文件名>_<名称><扩展名>"""
+    stem, ext = os.path.splitext(output_file)
+    return f"{stem}_{_safe_filename(name)}{ext}"
+
+
+def _safe_sheet_name(name):
+    """将名称转换为有效的工作表名（不含 \\ / ? * [ ] :，最长31个字符）"""
+    return re.sub(r'[\\/?*\[\]:]', '_', str(name)).strip("'")[:31] or 'Sheet'
+
+
+def run_multi_export(input_file, output_file, selections, options, as_sheets=False, workers=None,
+                     profiler=None):
+    """多组列导出：一次解析输入文件，把每组列选择分别导出到各自的文件或同一工作簿的各个工作表
+
+    selections 为 [(名称, 列选择)]，所有组的图片只下载一次、只生成一次缩略图。
+    分别输出到文件时，先在主进程中下载图片并生成缩略图，再由 workers 个工作进程
+    （默认为CPU核心数，不超过组数）同时写出各组，包含图片列的组直接插入这些缩略图；
+    --sheets 时在当前进程中依次写入同一个工作簿。
+    返回 (是否全部成功, 各组的结果列表)。
+    """
+    with profile_stage('resolve_columns'):
+        available_columns = read_column_names(input_file)
+    if available_columns is None or not check_filter_columns(options.get('filters'), available_columns):
+        return False, []
+    
+    resolved = []
+    for name, columns_spec in selections:
+        selected_columns = get_columns_from_input(columns_spec, available_columns)
         if not selected_columns:
-            print("错误: 没有有效的列可以导出")
-            return False
+            print(f"错误: 列选择 '{name}' 没有找到有效的列")
+            return False, []
+        resolved.append((name, selected_columns))
+    
+    output_format = detect_output_format(output_file, options.get('output_format'))
+    if as_sheets:
+        targets = [_safe_sheet_name(name) for name, _ in resolved]
+    else:
+        targets = [default_selection_output(output_file, name) for name, _ in resolved]
+    if len(set(targets)) != len(targets):
+        print("错误: 多个列选择的名称对应同一个输出文件或工作表，请使用不同的名称")
+        return False, []
+    
+    # 所有组需要的列只读取一次
+    read_columns = list(dict.fromkeys(col for _, selected_columns in resolved for col in selected_columns))
+    df = _read_for_export(input_file, read_columns, output_format, options)
+    if df is None:
+        return False, []
+    
+    download_images = options['download_images']
+    if download_images and output_format != 'xlsx':
+        print(f"提示: 图片只能嵌入 xlsx 文件，{output_format} 格式不下载图片")
+        download_images = False
+    
+    output_dir = os.path.dirname(output_file)
+    if output_dir:
+        os.makedirs(output_dir, exist_ok=True)
+    
+    started = time.perf_counter()
+    if as_sheets:
+        # 所有工作表的图片在写出之前一起开始下载和转换，同一张图片只处理一次
+        downloader = pipeline = None
+        if download_images and IMAGE_COLUMN in read_columns:
+            image_urls, _, _ = build_image_url_index(df[IMAGE_COLUMN])
+            if image_urls:
+                downloader = create_image_downloader(options)
+                pipeline = ImagePipeline(downloader, options.get('image_workers')).start(image_urls)
+        try:
+            success = export_sheets(df, list(zip(targets, (cols for _, cols in resolved))), output_file,
+                                    download_images, id_columns=options['id_columns'],
+                                    engine=options['engine'], image_downloader=downloader,
+                                    image_pipeline=pipeline)
+        finally:
+            if pipeline is not None:
+                pipeline.finish()
+            if downloader is not None:
+                downloader.close()
+                downloader.cache.close()
+        results = [{'name': name, 'output': f"{output_file}#{sheet}", 'columns': len(selected_columns),
+                    'rows': len(df), 'seconds': time.perf_counter() - started, 'success': success}
+                   for (name, selected_columns), sheet in zip(resolved, targets)]
+    else:
+        # 所有组的图片在主进程中只下载一次、只生成一次缩略图，包含图片列的组把缩略图带到工作进程中直接插入
+        thumbnails = None
+        if download_images and IMAGE_COLUMN in read_columns:
+            thumbnails = _prefetch_images(df, options, thumbnails=True)
         
-        # 检查是否有商品图片列且需要下载图片
-        image_column = None
-        if download_images:
-            if '商品图片' in selected_columns:
-                image_column = '商品图片'
+        if workers is None:
+            workers = os.cpu_count() or 1
+        workers = max(1, min(workers, len(resolved)))
+        # 输入已经解析，工作进程不需要解析缓存
+        worker_options = _pool_worker_options(dict(options, output_format=output_format, parse_cache_dir=None,
+                                                   download_images=download_images),
+                                              workers, profile=profiler is not None)
+        jobs = [(target, df[list(selected_columns)], thumbnails if IMAGE_COLUMN in selected_columns else None)
+                for (_, selected_columns), target in zip(resolved, targets)]
+        names = {target: (name, len(selected_columns)) for (name, selected_columns), target in zip(resolved, targets)}
+        del df
         
-        # 如果有图片列且要下载图片，调整列顺序，将图片列放在第一列
-        if download_images and image_column:
-            # 将图片列移到第一列
-            reordered_columns = [image_column]
-            for col in selected_columns:
-                if col != image_column:
-                    reordered_columns.append(col)
-            selected_columns = reordered_columns
+        print(f"\n多组列导出: {len(resolved)} 组，{workers} 个工作进程同时写出")
+        by_output = {}
         
-        result_df = df[selected_columns].copy()
+        def record(index, result):
+            name, columns = names[result['output']]
+            by_output[result['output']] = {'name': name, 'output': result['output'], 'columns': columns,
+                                           'rows': result['rows'], 'seconds': result['seconds'],
+                                           'success': result['success']}
+            if not result['success']:
+                print(f"❌ [{name}] {result['output']}")
+                for line in result['log'].strip().splitlines()[-5:]:
+                    print(f"    {line}")
+            if profiler is not None and result['stats']:
+                profiler.merge(result['stats'], output=result['output'], success=result['success'],
+                               rows=result['rows'])
         
-        # 使用ExcelWriter来控制格式
-        with pd.ExcelWriter(output_file, engine='openpyxl') as writer:
-            result_df.to_excel(writer, index=False, sheet_name='Sheet1')
-            
-            # 获取工作表
-            worksheet = writer.sheets['Sheet1']
-            
-            # 将可能的ID列设置为文本格式
-            id_columns = ['主订单号', '子订单号', '店铺ID', '商品ID', '规格编号', 
-                         '采购订单号', '平台物流单号', '手机号', '商户订单号']
-            
-            # 找到ID列的位置并设置为文本格式
-            for col_idx, col_name in enumerate(result_df.columns, 1):
-                if col_name in id_columns:
-                    for row_idx in range(2, len(result_df) + 2):
-                        cell = worksheet.cell(row=row_idx, column=col_idx)
-                        cell.number_format = '@'  # 文本格式
-            
-            # 如果需要下载图片且找到了图片列
-            if download_images and image_column:
-                # 收集所有图片URL
-                image_urls = []
-                empty_urls = 0
-                duplicate_urls = set()
-                for _, row in result_df.iterrows():
-                    url = row[image_column]
-                    if pd.notna(url) and str(url).strip():
-                        url_str = str(url)
-                        if url_str in duplicate_urls:
-                            continue  # 跳过重复URL
-                        duplicate_urls.add(url_str)
-                        image_urls.append(url_str)
-                    else:
-                        empty_urls += 1
-                
-                print(f"URL统计: 总行数={len(result_df)}, 有效URL={len(image_urls)}, 空URL={empty_urls}, 重复URL={len(result_df)-len(image_urls)-empty_urls}")
-                
-                temp_files_to_cleanup = []  # 初始化临时文件列表
-                if image_urls:
-                    # 并行下载所有图片
-                    image_results = download_images_parallel(image_urls, max_workers=8)
-                    
-                    # 找到图片列的位置（现在应该在第一列）
-                    image_col_idx = None
-                    for col_idx, col_name in enumerate(result_df.columns, 1):
-                        if col_name == image_column:
-                            image_col_idx = col_idx
-                            break
-                    
-                    if image_col_idx:
-                        # 设置图片列宽
-                        col_letter = worksheet.cell(row=1, column=image_col_idx).column_letter
-                        worksheet.column_dimensions[col_letter].width = 15
-                        
-                        inserted_count = 0
-                        
-                        # 插入图片到Excel
-                        for row_idx, (_, row) in enumerate(result_df.iterrows(), 2):
-                            image_url = str(row[image_column]) if pd.notna(row[image_column]) else ""
-                            
-                            if image_url in image_results:
-                                image_path = image_results[image_url]
-                                
-                                try:
-                                    # 确保文件存在
-                                    if not os.path.exists(image_path):
-                                        print(f"文件不存在，跳过: {image_path}")
-                                        continue
-                                    
-                                    # 统一转换图片格式为BMP以兼容Excel
-                                    final_image_path = convert_to_bmp_in_memory(image_path)
-                                    if not final_image_path:
-                                        print(f"图片格式转换失败，跳过: {image_path}")
-                                        continue
-                                    
-                                    # 如果是新生成的临时文件，记录以便后续清理
-                                    if final_image_path != image_path:
-                                        temp_files_to_cleanup.append(final_image_path)
-                                    
-                                    # 插入图片到Excel
-                                    img = xl_image.Image(final_image_path)
-                                    
-                                    # 获取原图尺寸并保持比例缩放显示
-                                    original_width = img.width
-                                    original_height = img.height
-                                    max_display_size = 100
-                                    
-                                    if original_width > max_display_size or original_height > max_display_size:
-                                        if original_width > original_height:
-                                            img.width = max_display_size
-                                            img.height = int(original_height * max_display_size / original_width)
-                                        else:
-                                            img.height = max_display_size
-                                            img.width = int(original_width * max_display_size / original_height)
-                                    
-                                    # 设置图片位置
-                                    cell_ref = worksheet.cell(row=row_idx, column=image_col_idx).coordinate
-                                    img.anchor = cell_ref
-                                    
-                                    worksheet.add_image(img)
-                                    
-                                    # 清空单元格中的URL文字，只保留图片
-                                    cell = worksheet.cell(row=row_idx, column=image_col_idx)
-                                    cell.value = ""
-                                    
-                                    # 设置行高以适应图片
-                                    worksheet.row_dimensions[row_idx].height = 80
-                                    
-                                    inserted_count += 1
-                                    
-                                except Exception as e:
-                                    print(f"插入图片失败 {image_url}: {e}")
-                        
-                        print(f"成功插入 {inserted_count} 张图片到Excel")
-                else:
-                    print("没有找到有效的图片URL")
+        # 各组的列不同，由 _run_shard_job 按每组 DataFrame 的列写出
+        _run_in_worker_pool(_run_shard_job, jobs, (None, worker_options), worker_options, workers, record)
+        results = [by_output[target] for target in targets]
+    wall_seconds = time.perf_counter() - started
+    
+    print("\n多组列导出汇总:")
+    print("=" * 60)
+    for result in results:
+        mark = '✅' if result['success'] else '❌'
+        print(f"{mark} [{result['name']}] {result['output']} | {result['columns']} 列 | "
+              f"{result['rows']} 行 | {result['seconds']:.2f} 秒")
+    print(f"读取 1 次，写出 {len(results)} 组，写出耗时: {wall_seconds:.2f} 秒")
+    print("=" * 60)
+    return all(result['success'] for result in results), results
+
+
+# 服务模式的默认监听地址、工作线程数和解析结果内存预算(MB)
+DEFAULT_SERVE_ADDRESS = '127.0.0.1:8790'
+DEFAULT_SERVE_WORKERS = 4
+DEFAULT_SERVE_CACHE_MB = 1024
+
+
+class ServiceError(Exception):
+    """服务请求错误，status 为返回的HTTP状态码"""
+
+    def __init__(self, message, status=400):
+        super().__init__(message)
+        self.status = status
+
+
+class ExportService:
+    """常驻服务的处理逻辑：保持模块已导入，并在多次请求之间共用
+
+    - 解析结果的内存缓存（FrameCache），同一文件的后续请求不再重新解析
+    - 图片下载器（连接池和图片缓存）和生成缩略图的执行器
+    每个请求在服务器的工作线程中调用 list_columns / export，返回可以序列化为JSON的结果。
+    与批处理一样，图片缓存的淘汰不在单个请求结束时进行：等所有下载图片的请求都结束后统一淘汰，
+    避免删除其他请求已查到但尚未生成缩略图的图片。
+    """
+
+    def __init__(self, options, max_cache_bytes=None):
+        self.options = options
+        self.frames = FrameCache(max_cache_bytes)
+        self.started_at = time.time()
+        self.requests = 0
+        self.failed = 0
+        self._lock = threading.Lock()
+        self._downloader = None
+        self._image_executor = None
+        self._image_lock = threading.Lock()
+        self._image_requests = 0
+        self._images_since = None
+
+    def _image_resources(self):
+        """返回共用的图片下载器和缩略图执行器，首次需要下载图片时创建
+
+        下载器不设置磁盘预算，单个请求结束时不淘汰缓存，由 _end_image_request 统一淘汰。
+        执行器损坏（例如某个转换进程处理超大图片时退出）后重新创建，不影响之后的请求。
+        """
+        with self._lock:
+            if self._downloader is None:
+                self._downloader = create_image_downloader(dict(self.options, cache_max_bytes=None))
+            if self._image_executor is None or not _executor_usable(self._image_executor):
+                if self._image_executor is not None:
+                    print("图片转换进程池已损坏，重新创建")
+                    self._image_executor.shutdown(wait=False)
+                self._image_executor = create_image_executor(self.options.get('image_workers'))
+            return self._downloader, self._image_executor
+
+    def _begin_image_request(self):
+        """登记一个下载图片的请求；淘汰缓存期间新的请求在这里等待"""
+        with self._image_lock:
+            if self._image_requests == 0:
+                self._images_since = time.time()
+            self._image_requests += 1
+
+    def _end_image_request(self):
+        """一个下载图片的请求结束；没有其他此类请求时按磁盘预算淘汰缓存，保留这段时间内用到的图片"""
+        with self._image_lock:
+            self._image_requests -= 1
+            if self._image_requests or self.options.get('cache_max_bytes') is None:
+                return
+            removed_files, freed_bytes = self._downloader.cache.evict(
+                max_bytes=self.options['cache_max_bytes'], keep_since=self._images_since)
+            if removed_files:
+                print(f"缓存淘汰: 删除 {removed_files} 个文件，释放 {freed_bytes / 1024 / 1024:.2f} MB")
+
+    @staticmethod
+    def _flag(params, name, default):
+        """读取布尔参数：JSON 中的 true/false，或查询字符串中的 1/0、true/false、yes/no、on/off"""
+        value = params.get(name)
+        if value is None:
+            return default
+        if isinstance(value, bool):
+            return value
+        text = str(value).strip().lower()
+        if text in ('1', 'true', 'yes', 'on'):
+            return True
+        if text in ('', '0', 'false', 'no', 'off'):
+            return False
+        raise ServiceError(f"无效的布尔参数 {name}: {value}")
+
+    @staticmethod
+    def _require(params, name):
+        value = params.get(name)
+        if value is None or value == '':
+            raise ServiceError(f"缺少参数: {name}")
+        return value
+
+    def _input_file(self, params):
+        input_file = str(self._require(params, 'input'))
+        if not os.path.exists(input_file):
+            raise ServiceError(f"输入文件 '{input_file}' 不存在", status=404)
+        return input_file
+
+    def _id_columns(self, params):
+        id_columns = params.get('id_columns')
+        if isinstance(id_columns, str):
+            id_columns = [name.strip() for name in id_columns.split(',') if name.strip()]
+        return id_columns or self.options['id_columns'] or DEFAULT_ID_COLUMNS
+
+    def list_columns(self, params):
+        """返回输入文件的全部列名"""
+        input_file = self._input_file(params)
+        columns = read_column_names(input_file)
+        if columns is None:
+            raise ServiceError(f"读取文件失败: {input_file}", status=500)
+        return {'input': input_file, 'columns': columns}
+
+    def export(self, params):
+        """导出选中的列，参数与命令行相同：input、output、columns、format、download_images、engine、
+        filters（过滤条件列表）和 id_columns；返回导出结果和各阶段耗时"""
+        input_file = self._input_file(params)
+        columns_spec = str(self._require(params, 'columns'))
+        output_format = params.get('format') or None
+        if output_format is not None and output_format not in OUTPUT_FORMATS:
+            raise ServiceError(f"不支持的输出格式: {output_format}")
+        output_format = detect_output_format(str(self._require(params, 'output')), output_format)
+        output_file = normalize_output_path(str(params['output']), output_format)
+        engine = params.get('engine') or self.options['engine']
+        if engine not in EXPORT_ENGINES:
+            raise ServiceError(f"不支持的导出引擎: {engine}")
+        filters = params.get('filters') or []
+        if isinstance(filters, str):
+            filters = [filters]
+        try:
+            filters = [RowFilter.parse(expression) for expression in filters] or None
+        except ValueError as e:
+            raise ServiceError(str(e))
+        id_columns = self._id_columns(params)
+        download_images = self._flag(params, 'download_images', self.options['download_images'])
+        if output_format != 'xlsx' and download_images:
+            print(f"提示: 图片只能嵌入 xlsx 文件，{output_format} 格式不下载图片")
+            download_images = False
         
-        print("\n导出成功!")
-        print(f"导出文件: {output_file}")
-        print(f"导出列数: {len(selected_columns)}")
-        print(f"数据行数: {result_df.shape[0]}")
-        print(f"导出的列: {selected_columns}")
+        timing = {}
+        started = time.perf_counter()
+        available_columns, selected_columns = resolve_selected_columns(input_file, columns_spec)
+        if not selected_columns:
+            raise ServiceError(f"没有找到有效的列: {columns_spec}")
+        timing['resolve_columns'] = time.perf_counter() - started
         
-        if download_images and image_column:
-            print(f"图片处理: 从 {image_column} 列处理了图片并保存到 images/ 目录")
+        # 与命令行一样，csv/jsonl/parquet 按单元格原文输出，使用单独缓存的文本解析结果
+        text = output_format != 'xlsx'
+        cached = self.frames.contains(input_file, id_columns, text=text)
+        started = time.perf_counter()
+        df = read_excel_file(input_file, usecols=selected_columns, id_columns=id_columns,
+                             parse_cache=self.frames, filters=filters, text=text)
+        if df is None:
+            raise ServiceError(f"读取文件失败: {input_file}", status=500)
+        timing['read'] = time.perf_counter() - started
         
-        # Excel保存完成后清理临时文件
-        if 'temp_files_to_cleanup' in locals():
-            for temp_file in temp_files_to_cleanup:
-                try:
-                    os.remove(temp_file)
-                except Exception:
-                    pass  # 忽略清理失败
+        started = time.perf_counter()
+        output_dir = os.path.dirname(output_file)
+        if output_dir:
+            os.makedirs(output_dir, exist_ok=True)
+        if output_format == 'xlsx' and download_images:
+            downloader, image_executor = self._image_resources()
+            self._begin_image_request()
+            try:
+                success = export_columns(df, selected_columns, output_file, download_images,
+                                         id_columns=id_columns, engine=engine,
+                                         image_downloader=downloader, image_workers=image_executor)
+            finally:
+                self._end_image_request()
+        elif output_format == 'xlsx':
+            success = export_columns(df, selected_columns, output_file, id_columns=id_columns, engine=engine)
+        else:
+            success = export_stream(_frame_chunks(df), selected_columns, output_file, output_format) is not None
+        timing['write'] = time.perf_counter() - started
+        if not success:
+            raise ServiceError(f"导出失败: {output_file}", status=500)
         
-        return True
-    
-    except Exception as e:
-        import traceback
-        print(f"导出失败: {e}")
-        print(f"详细错误信息:\n{traceback.format_exc()}")
-        return False
+        return {
+            'input': input_file,
+            'output': output_file,
+            'format': output_format,
+            'columns': list(selected_columns),
+            'rows': len(df),
+            'parse_cache': 'hit' if cached else 'miss',
+            'timing': timing,
+        }
 
+    def stats(self):
+        """返回服务的运行统计"""
+        result = {
+            'uptime_seconds': time.time() - self.started_at,
+            'requests': self.requests,
+            'failed': self.failed,
+            'frame_cache': self.frames.stats(),
+        }
+        if self._downloader is not None:
+            result['image_cache'] = {'hits': self._downloader.cache.hits,
+                                     'misses': self._downloader.cache.misses}
+        return result
 
-def list_columns(df):
-    """显示所有可用的列"""
-    print("\n可用的列:")
-    print("=" * 60)
-    for i, col in enumerate(df.columns, 1):
-        print(f"{i:2d}. {col}")
-    print("=" * 60)
+    def handle(self, operation, params, queued_seconds=0.0):
+        """处理一个请求，返回 (HTTP状态码, 结果字典)；结果中的 timing 包含排队时间和总耗时"""
+        handlers = {'columns': self.list_columns, 'export': self.export}
+        started = time.perf_counter()
+        with self._lock:
+            self.requests += 1
+        try:
+            result = dict(handlers[operation](params), success=True)
+            status = 200
+        except ServiceError as e:
+            result, status = {'success': False, 'error': str(e)}, e.status
+        except Exception as e:
+            print(f"请求处理失败: {e}")
+            result, status = {'success': False, 'error': str(e)}, 500
+        if status != 200:
+            with self._lock:
+                self.failed += 1
+        timing = result.setdefault('timing', {})
+        timing['queued'] = queued_seconds
+        timing['total'] = queued_seconds + time.perf_counter() - started
+        return status, result
+
+    def close(self):
+        """关闭图片下载器、缩略图执行器并清空解析结果缓存"""
+        if self._downloader is not None:
+            self._downloader.close()
+            self._downloader.cache.close()
+        if self._image_executor is not None:
+            self._image_executor.shutdown(wait=True)
+        self.frames.close()
+
+
+def parse_serve_address(address):
+    """解析监听地址：unix:/path/to.sock、HOST:PORT 或 PORT；返回 ('unix', 路径) 或 ('tcp', (主机, 端口))"""
+    if address.startswith('unix:'):
+        return 'unix', address[len('unix:'):]
+    host, _, port = address.rpartition(':')
+    if not port.isdigit():
+        raise ValueError(f"无效的监听地址: {address}")
+    return 'tcp', (host or '127.0.0.1', int(port))
+
+
+def _remove_stale_socket(path):
+    """删除上次运行遗留的 Unix socket 文件；路径已存在但不是 socket 时抛出 ValueError，不删除"""
+    import stat
+
+    try:
+        mode = os.stat(path).st_mode
+    except FileNotFoundError:
+        return
+    if not stat.S_ISSOCK(mode):
+        raise ValueError(f"路径已存在且不是 socket: {path}")
+    os.remove(path)
+
+
+def create_service_server(service, address, workers=DEFAULT_SERVE_WORKERS):
+    """创建HTTP服务器：请求交给固定大小的工作线程池处理，超出的请求排队等待"""
+    import socket
+    import socketserver
+    from http.server import BaseHTTPRequestHandler, HTTPServer
+
+    kind, bind_address = parse_serve_address(address)
+
+    class Handler(BaseHTTPRequestHandler):
+        def _send_json(self, status, body):
+            data = json.dumps(body, ensure_ascii=False, default=str).encode('utf-8')
+            self.send_response(status)
+            self.send_header('Content-Type', 'application/json; charset=utf-8')
+            self.send_header('Content-Length', str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def _route(self, params, method):
+            path = urlparse(self.path).path.rstrip('/')
+            queued = time.perf_counter() - self.server.accepted.time
+            if path == '/export' and method != 'POST':
+                # 导出会写文件，只接受 POST，避免网页通过链接或图片地址触发
+                self.send_response(405)
+                self.send_header('Allow', 'POST')
+                self.send_header('Content-Length', '0')
+                self.end_headers()
+            elif path == '/health':
+                self._send_json(200, {'status': 'ok'})
+            elif path == '/stats':
+                self._send_json(200, service.stats())
+            elif path in ('/columns', '/export'):
+                self._send_json(*service.handle(path[1:], params, queued_seconds=queued))
+            else:
+                self._send_json(404, {'success': False, 'error': f"未知的路径: {path}"})
+
+        def do_GET(self):
+            from urllib.parse import parse_qs
+
+            query = parse_qs(urlparse(self.path).query)
+            self._route({key: values[-1] for key, values in query.items()}, 'GET')
+
+        def do_POST(self):
+            # 浏览器发出的请求带有 Origin；服务不提供网页，这样的请求只可能来自其他网站
+            if self.headers.get('Origin'):
+                self._send_json(403, {'success': False, 'error': '不接受来自浏览器网页的请求'})
+                return
+            # 只接受 JSON：网页不经过 CORS 预检无法发送 application/json，服务也不响应预检
+            if self.headers.get_content_type() != 'application/json':
+                self._send_json(415, {'success': False, 'error': '请求内容必须是 application/json'})
+                return
+            length = int(self.headers.get('Content-Length') or 0)
+            try:
+                params = json.loads(self.rfile.read(length) or b'{}')
+                if not isinstance(params, dict):
+                    raise ValueError('请求内容必须是JSON对象')
+            except ValueError as e:
+                self._send_json(400, {'success': False, 'error': f"无效的JSON: {e}"})
+                return
+            self._route(params, 'POST')
+
+        def log_message(self, format, *args):
+            print(f"[{datetime.now():%H:%M:%S}] {format % args}")
+
+    class PooledServerMixIn:
+        """与 socketserver.ThreadingMixIn 类似，但使用固定大小的线程池"""
+
+        def init_pool(self):
+            self.pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='serve')
+            self.accepted = threading.local()
+
+        def process_request(self, request, client_address):
+            self.pool.submit(self._process_in_pool, request, client_address, time.perf_counter())
+
+        def _process_in_pool(self, request, client_address, accepted_time):
+            self.accepted.time = accepted_time
+            try:
+                self.finish_request(request, client_address)
+            except Exception:
+                self.handle_error(request, client_address)
+            finally:
+                self.shutdown_request(request)
+
+        def server_close(self):
+            super().server_close()
+            # 绑定地址失败时 TCPServer.__init__ 会在 init_pool 之前调用 server_close
+            pool = getattr(self, 'pool', None)
+            if pool is not None:
+                pool.shutdown(wait=True)
+
+    if kind == 'unix':
+        if not hasattr(socket, 'AF_UNIX'):
+            raise ValueError('当前系统不支持 Unix socket')
+        _remove_stale_socket(bind_address)
+
+        class Server(PooledServerMixIn, socketserver.UnixStreamServer):
+            pass
+    else:
+        class Server(PooledServerMixIn, HTTPServer):
+            pass
+
+    server = Server(bind_address, Handler)
+    server.init_pool()
+    return server
+
+
+def serve(address, options, workers=DEFAULT_SERVE_WORKERS, max_cache_bytes=None):
+    """以常驻服务方式运行，直到按 Ctrl+C 或收到 SIGTERM"""
+    import signal
+
+    def stop(signum, frame):
+        raise KeyboardInterrupt
+
+    signal.signal(signal.SIGTERM, stop)
+    service = ExportService(options, max_cache_bytes=max_cache_bytes)
+    server = create_service_server(service, address, workers=workers)
+    kind, bind_address = parse_serve_address(address)
+    if kind == 'tcp':
+        host, port = server.server_address[:2]
+        location = f"http://{host}:{port}"
+    else:
+        location = f"unix:{bind_address}"
+    print(f"服务已启动: {location} ({workers} 个工作线程)，按 Ctrl+C 退出")
+    print("接口: GET /columns?input=... | POST /export | GET /stats | GET /health")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print("\n服务已停止")
+    finally:
+        server.server_close()
+        service.close()
+        if kind == 'unix':
+            with contextlib.suppress(ValueError):
+                _remove_stale_socket(bind_address)
 
 
 def main():
@@ -467,6 +3804,15 @@ def main():
   
   # 导出并下载商品图片
   python cli_excel_processor.py -i input.xls -o output.xlsx -c "编号,商品图片,商品标题" --download-images
+  
+  # 一次读取，导出多组列：output_财务.xlsx、output_物流.xlsx（加 --sheets 则写入 output.xlsx 的两个工作表）
+  python cli_excel_processor.py -i input.xls -o output.xlsx -c "财务=编号,主订单号,买家付款金额" -c "物流=编号,平台物流,平台物流单号"
+  
+  # 批处理 - 目录、通配符或清单文件中的所有文件
+  python cli_excel_processor.py --batch "exports/*.xls" --output-dir filtered -c "编号,平台,站点"
+  
+  # 常驻服务 - 通过HTTP接收导出请求，解析结果和图片下载器在请求之间复用
+  python cli_excel_processor.py --serve 127.0.0.1:8790 --download-images
         '''
     )
     
@@ -474,10 +3820,33 @@ def main():
                        help='输入Excel文件路径')
     
     parser.add_argument('-o', '--output',
-                       help='输出Excel文件路径 (默认: output.xlsx)')
+                       help='输出文件路径，扩展名决定输出格式: .xlsx/.csv/.jsonl/.parquet (默认: output.xlsx)')
     
     parser.add_argument('-c', '--columns',
-                       help='要导出的列。支持格式: 列序号(1,2,5,10-15) | 列名(编号,平台,站点) | all(所有列)')
+                       action='append',
+                       help='要导出的列。支持格式: 列序号(1,2,5,10-15) | 列名(编号,平台,站点) | all(所有列)。'
+                            '可以多次指定并写为 名称=列选择，一次读取后分别导出到 <输出文件名>_<名称> 文件')
+    
+    parser.add_argument('--sheets',
+                       action='store_true',
+                       help='多个 -c 列选择写入同一个 xlsx 文件的不同工作表（工作表名为各自的名称），而不是分别输出文件')
+    
+    parser.add_argument('--batch',
+                       help='批处理: 目录、通配符(如 "exports/*.xls") 或清单文件(每行 "输入文件,输出文件")')
+    
+    parser.add_argument('--output-dir',
+                       help='批处理的输出目录 (默认: 与输入文件相同目录，文件名为 <原文件名>_filtered.xlsx，扩展名随 --format 变化)')
+    
+    parser.add_argument('--batch-workers',
+                       type=int,
+                       help='批处理的并行进程数 (默认: CPU核心数)')
+    
+    parser.add_argument('--filter',
+                       action='append',
+                       dest='filters',
+                       metavar='EXPR',
+                       help='行过滤条件，可多次指定（同时满足）。格式: 列名=值 | 列名=值1|值2 | 列名!=值 | '
+                            '列名>=数字或日期 | 列名<值 | 列名~正则 | 列名!~正则')
     
     parser.add_argument('--list-columns',
                        action='store_true',
@@ -487,8 +3856,222 @@ def main():
                        action='store_true',
                        help='下载商品图片并在Excel中展示')
     
+    parser.add_argument('--download-workers',
+                       type=int,
+                       default=8,
+                       help='同时下载图片的线程数 (默认: 8)')
+    
+    parser.add_argument('--per-host-limit',
+                       type=int,
+                       default=4,
+                       help='同一主机的最大并发连接数，0 表示不限制 (默认: 4)')
+    
+    parser.add_argument('--download-timeout',
+                       type=float,
+                       default=30,
+                       help='单次图片请求的超时时间(秒) (默认: 30)')
+    
+    parser.add_argument('--download-retries',
+                       type=int,
+                       default=3,
+                       help='图片下载的最大尝试次数，失败后按指数退避重试 (默认: 3)')
+    
+    parser.add_argument('--image-workers',
+                       type=int,
+                       help='解码和缩放图片的进程数，1 表示只在主进程中处理 (默认: CPU核心数)')
+    
+    parser.add_argument('--cache-dir',
+                       default='images',
+                       help='图片缓存目录 (默认: images)')
+    
+    parser.add_argument('--cache-max-size',
+                       type=float,
+                       help='图片缓存的磁盘预算(MB)，超出时按最近最少使用淘汰 (默认: 不限制)')
+    
+    parser.add_argument('--cache-revalidate',
+                       action='store_true',
+                       help='使用 ETag/Last-Modified 向服务器确认缓存的图片是否已更新')
+    
+    parser.add_argument('--cache-stats',
+                       action='store_true',
+                       help='显示图片缓存统计信息后退出')
+    
+    parser.add_argument('--parse-cache',
+                       metavar='DIR',
+                       help='启用解析缓存并指定缓存目录：解析结果以 Feather 格式保存，再次处理同一文件时只加载选中的列 (需要 pyarrow)')
+    
+    parser.add_argument('--shard-rows',
+                       type=int,
+                       metavar='N',
+                       help='分片导出：每个输出文件最多 N 行')
+    
+    parser.add_argument('--shard-by',
+                       metavar='COLUMN',
+                       help='分片导出：按该列的值分组，每个值一个输出文件，例如 店铺名称')
+    
+    parser.add_argument('--shard-size',
+                       type=float,
+                       metavar='MB',
+                       help='分片导出：按估算的文件大小切分，每个输出文件约 MB 兆字节')
+    
+    parser.add_argument('--shard-workers',
+                       type=int,
+                       help='分片导出时同时写出分片的进程数 (默认: CPU核心数)')
+    
+    parser.add_argument('--serve',
+                       nargs='?',
+                       const=DEFAULT_SERVE_ADDRESS,
+                       metavar='ADDRESS',
+                       help='以常驻服务方式运行，通过HTTP接收列查询和导出请求。地址为 HOST:PORT 或 '
+                            f'unix:/path/to.sock (默认: {DEFAULT_SERVE_ADDRESS})')
+    
+    parser.add_argument('--serve-workers',
+                       type=int,
+                       default=DEFAULT_SERVE_WORKERS,
+                       help=f'服务模式下同时处理请求的线程数 (默认: {DEFAULT_SERVE_WORKERS})')
+    
+    parser.add_argument('--serve-cache-size',
+                       type=float,
+                       default=DEFAULT_SERVE_CACHE_MB,
+                       metavar='MB',
+                       help=f'服务模式下保存在内存中的解析结果的预算(MB)，超出时按最近最少使用淘汰 (默认: {DEFAULT_SERVE_CACHE_MB})')
+    
+    parser.add_argument('--incremental',
+                       nargs='?',
+                       const='',
+                       metavar='STATE_FILE',
+                       help='增量导出：只导出上次之后新增的行，状态保存在 STATE_FILE 中 '
+                            '(默认: <输出文件>.incremental.sqlite3)')
+    
+    parser.add_argument('--key-column',
+                       help='增量导出时识别行的键列，例如 子订单号 (默认: 按所选列的内容识别)')
+    
+    parser.add_argument('--format',
+                       choices=list(OUTPUT_FORMATS),
+                       help='输出格式: xlsx | csv | jsonl | parquet (默认: 根据 -o 的扩展名判断，无法判断时为 xlsx)')
+    
+    parser.add_argument('--engine',
+                       choices=['openpyxl', 'fast'],
+                       default='openpyxl',
+                       help='xlsx导出引擎: openpyxl(默认) | fast(只写模式流式写出，内存占用小、速度快)')
+    
+    parser.add_argument('--profile',
+                       action='store_true',
+                       help='处理完成后显示各阶段的耗时、行/秒、下载字节数、缓存命中率和内存峰值')
+    
+    parser.add_argument('--stats-json',
+                       metavar='PATH',
+                       help='将各阶段的性能统计以JSON格式写入指定文件，便于监控系统采集')
+    
+    parser.add_argument('--id-columns',
+                       help='按文本保留的长数字ID列，逗号分隔 (默认: ' + ','.join(DEFAULT_ID_COLUMNS) + ')')
+    
     args = parser.parse_args()
     
+    # 图片缓存配置
+    cache_max_bytes = int(args.cache_max_size * 1024 * 1024) if args.cache_max_size is not None else None
+    
+    # 仅查看图片缓存统计
+    if args.cache_stats:
+        cache = ImageCache(args.cache_dir, max_bytes=cache_max_bytes)
+        print_cache_stats(cache)
+        cache.close()
+        return
+    
+    # 解析ID列配置
+    id_columns = None
+    if args.id_columns:
+        id_columns = [name.strip() for name in args.id_columns.split(',') if name.strip()]
+    
+    # 解析行过滤条件
+    filters = None
+    if args.filters:
+        try:
+            filters = [RowFilter.parse(expression) for expression in args.filters]
+        except ValueError as e:
+            print(f"错误: {e}")
+            sys.exit(1)
+    
+    # 导出相关配置（批处理的工作进程也使用这份配置）
+    options = {
+        'download_images': args.download_images,
+        'id_columns': id_columns,
+        'engine': args.engine,
+        'image_workers': args.image_workers,
+        'cache_dir': args.cache_dir,
+        'cache_max_bytes': cache_max_bytes,
+        'cache_revalidate': args.cache_revalidate,
+        'download_workers': args.download_workers,
+        'per_host_limit': args.per_host_limit,
+        'download_timeout': args.download_timeout,
+        'download_retries': args.download_retries,
+        'parse_cache_dir': args.parse_cache,
+        'filters': filters,
+        'output_format': args.format,
+        'profile': bool(args.profile or args.stats_json),
+        'incremental': args.incremental is not None,
+        'key_column': args.key_column,
+    }
+    
+    # 解析列选择：多个 -c 或带名称的 -c 为多组列导出
+    try:
+        selections = parse_column_selections(args.columns) if args.columns else None
+    except ValueError as e:
+        print(f"错误: {e}")
+        sys.exit(1)
+    multi = bool(selections) and selections[0][0] is not None
+    columns_spec = selections[0][1] if selections and not multi else None
+    if multi and (args.batch or args.incremental is not None or args.serve is not None
+                  or args.shard_rows or args.shard_by or args.shard_size):
+        print("错误: 多个列选择不能与 --batch、--incremental、--serve 或分片导出同时使用")
+        sys.exit(1)
+    if args.sheets and not multi:
+        print("错误: --sheets 需要使用多个 -c 列选择（或 名称=列选择）")
+        sys.exit(1)
+    
+    # 服务模式
+    if args.serve is not None:
+        if args.serve_workers < 1:
+            print("错误: --serve-workers 必须大于0")
+            sys.exit(1)
+        try:
+            serve(args.serve, options, workers=args.serve_workers,
+                  max_cache_bytes=int(args.serve_cache_size * 1024 * 1024))
+        except (OSError, ValueError) as e:
+            print(f"错误: 无法启动服务: {e}")
+            sys.exit(1)
+        return
+    
+    sharded = bool(args.shard_rows or args.shard_by or args.shard_size)
+    if sharded and (args.batch or args.incremental is not None):
+        print("错误: 分片导出不能与 --batch 或 --incremental 同时使用")
+        sys.exit(1)
+    if (args.shard_rows is not None and args.shard_rows < 1) or (args.shard_size is not None and args.shard_size <= 0):
+        print("错误: --shard-rows 和 --shard-size 必须大于0")
+        sys.exit(1)
+    
+    # 批处理模式
+    if args.batch:
+        if not args.columns:
+            print("错误: 批处理模式需要使用 -c 参数指定要导出的列")
+            sys.exit(1)
+        if args.incremental:
+            print("错误: 批处理模式下每个输出文件使用各自的增量状态文件，--incremental 不能指定文件路径")
+            sys.exit(1)
+        jobs = resolve_batch_jobs(args.batch, args.output_dir, args.format)
+        if not jobs:
+            print(f"错误: 没有找到要处理的文件: {args.batch}")
+            sys.exit(1)
+        profiler = StageProfiler() if options['profile'] else None
+        success = process_batch(jobs, columns_spec, options, args.batch_workers, profiler=profiler)
+        if profiler is not None:
+            report_profile(profiler.summary(), args.profile, args.stats_json,
+                           input=args.batch, output=args.output_dir, format=args.format,
+                           success=success, rows=sum(item['rows'] for item in profiler.files))
+        if not success:
+            sys.exit(1)
+        return
+    
     # 如果没有提供输入文件，显示帮助信息并退出
     if not args.input:
         parser.print_help()
@@ -499,37 +4082,101 @@ def main():
         print(f"错误: 输入文件 '{args.input}' 不存在")
         sys.exit(1)
     
-    # 读取Excel文件
-    df = read_excel_file(args.input)
-    if df is None:
-        sys.exit(1)
-    
-    # 如果只是要查看列信息
+    # 如果只是要查看列信息（只读取表头行）
     if args.list_columns:
-        list_columns(df)
+        columns = read_column_names(args.input)
+        if columns is None:
+            sys.exit(1)
+        list_columns(columns)
         return
     
     # 检查是否提供了列信息
     if not args.columns:
         print("错误: 请使用 -c 参数指定要导出的列，或使用 --list-columns 查看所有可用列")
-        list_columns(df)
+        columns = read_column_names(args.input)
+        if columns is not None:
+            list_columns(columns)
         sys.exit(1)
     
-    # 解析列选择
-    available_columns = list(df.columns)
-    selected_columns = get_columns_from_input(args.columns, available_columns)
+    # 设置输出文件名
+    output_format = detect_output_format(args.output or '', args.format)
+    output_file = normalize_output_path(args.output or 'output', output_format)
     
-    if not selected_columns:
-        print("错误: 没有找到有效的列")
-        sys.exit(1)
+    # 多组列导出
+    if multi:
+        if args.sheets and output_format != 'xlsx':
+            print("错误: --sheets 只能用于 xlsx 输出")
+            sys.exit(1)
+        profiler = enable_profiling() if options['profile'] else None
+        try:
+            success, results = run_multi_export(args.input, output_file, selections,
+                                                dict(options, output_format=output_format),
+                                                as_sheets=args.sheets, profiler=profiler)
+        finally:
+            disable_profiling()
+        outputs = [output_file] if args.sheets else [result['output'] for result in results]
+        if profiler is not None:
+            report_profile(profiler.summary(), args.profile, args.stats_json,
+                           input=args.input, output=outputs, format=output_format, success=success,
+                           selections=results)
+        if not success:
+            print("\n❌ 处理失败")
+            sys.exit(1)
+        print(f"\n✅ 处理完成! 文件已保存为: {', '.join(outputs)}")
+        return
     
-    # 设置输出文件名
-    output_file = args.output or 'output.xlsx'
-    if not output_file.endswith('.xlsx'):
-        output_file += '.xlsx'
+    # 分片导出
+    if sharded:
+        profiler = enable_profiling() if options['profile'] else None
+        try:
+            success, rows = run_sharded_export(args.input, output_file, columns_spec,
+                                               dict(options, output_format=output_format),
+                                               shard_rows=args.shard_rows, shard_by=args.shard_by,
+                                               shard_bytes=(int(args.shard_size * 1024 * 1024)
+                                                            if args.shard_size else None),
+                                               shard_workers=args.shard_workers, profiler=profiler)
+        finally:
+            disable_profiling()
+        if profiler is not None:
+            report_profile(profiler.summary(), args.profile, args.stats_json,
+                           input=args.input, output=default_shard_index(output_file),
+                           format=output_format, success=success, rows=rows)
+        if not success:
+            print("\n❌ 处理失败")
+            sys.exit(1)
+        print(f"\n✅ 处理完成! 分片索引已保存为: {default_shard_index(output_file)}")
+        return
     
     # 导出数据
-    success = export_columns(df, selected_columns, output_file, args.download_images)
+    parse_cache = ParseCache(args.parse_cache) if args.parse_cache else None
+    image_downloader = None
+    if args.download_images:
+        image_downloader = create_image_downloader(options)
+    
+    profiler = enable_profiling() if options['profile'] else None
+    try:
+        success, rows = run_export(args.input, output_file, columns_spec, args.download_images,
+                                id_columns=id_columns, engine=args.engine,
+                                image_downloader=image_downloader,
+                                image_workers=args.image_workers,
+                                parse_cache=parse_cache,
+                                filters=filters,
+                                output_format=output_format,
+                                incremental=(args.incremental or default_incremental_state(output_file)
+                                             if args.incremental is not None else None),
+                                key_column=args.key_column)
+    finally:
+        if image_downloader:
+            image_downloader.close()
+            image_downloader.cache.close()
+        if parse_cache:
+            parse_cache.close()
+        disable_profiling()
+    
+    if profiler is not None:
+        report_profile(profiler.summary(), args.profile, args.stats_json,
+                       input=args.input, output=output_file, format=output_format,
+                       success=success, rows=rows)
     
     if success:
         print(f"\n✅ 处理完成! 文件已保存为: {output_file}")
@@ -539,6 +4186,8 @@ def main():
 
 
 if __name__ == "__main__":
+    # 打包为exe后使用进程池需要
+    multiprocessing.freeze_support()
     try:
         main()
     except KeyboardInterrupt: